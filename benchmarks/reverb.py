@@ -0,0 +1,105 @@
+"""
+Benchmark of the compiled ReVerb matcher against the previous implementation, which checked the tags of each token
+against Python lists, on random PTB tagged BET contexts; both must extract the same patterns.
+
+    python benchmarks/reverb.py [--contexts N] [--repeat N]
+"""
+
+import io
+import random
+import timeit
+from argparse import ArgumentParser
+from typing import Any, List, Tuple
+
+from snowball.reverb_breds import PTB_TAGS, Reverb
+
+OTHER_TAGS = [",", ".", "CC", "CD", "FW", "NNP", ":"]
+
+
+def previous_extract_reverb_patterns_tagged_ptb(tagged_text: List[Tuple[Any, Any]]) -> List[Tuple[Any, Any]]:
+    """The scanner as it was before the matcher was compiled, see Reverb.extract_reverb_patterns_tagged_ptb()"""
+    patterns_tags = []
+    i = 0
+    limit = len(tagged_text) - 1
+    tags = tagged_text
+
+    verb = ["VB", "VBD", "VBD|VBN", "VBG", "VBG|NN", "VBN", "VBP", "VBP|TO", "VBZ", "VP"]
+    adverb = ["RB", "RBR", "RBS", "RB|RP", "RB|VBG", "WRB"]
+    particule = ["POS", "PRT", "TO", "RP"]
+    noun = ["NN", "NNP", "NNPS", "NNS", "NN|NNS", "NN|SYM", "NN|VBG", "NP"]
+    adjective = ["JJ", "JJR", "JJRJR", "JJS", "JJ|RB", "JJ|VBG"]
+    pronoun = ["WP", "WP$", "PRP", "PRP$", "PRP|VBP"]
+    determiner = ["DT", "EX", "PDT", "WDT"]
+    adp = ["IN", "IN|RP"]
+
+    while i <= limit:
+        tmp = io.StringIO()
+        tmp_tags = []
+        if tags[i][1] in verb:
+            tmp.write(tags[i][0] + " ")
+            tmp_tags.append((tags[i][0], tags[i][1]))
+            i += 1
+            while i <= limit and (tags[i][1] in verb or tags[i][1] in adverb or tags[i][1] in particule):
+                tmp.write(tags[i][0] + " ")
+                tmp_tags.append((tags[i][0], tags[i][1]))
+                i += 1
+            while i <= limit and (
+                tags[i][1] in noun
+                or tags[i][1] in adjective
+                or tags[i][1] in adverb
+                or tags[i][1] in pronoun
+                or tags[i][1] in determiner
+            ):
+                tmp.write(tags[i][0] + " ")
+                tmp_tags.append((tags[i][0], tags[i][1]))
+                i += 1
+            while i <= limit and (tags[i][1] in adp or tags[i][1] in particule):
+                tmp.write(tags[i][0] + " ")
+                tmp_tags.append((tags[i][0], tags[i][1]))
+                i += 1
+            patterns_tags.append(tmp_tags)
+        i += 1
+    return [item for sublist in patterns_tags for item in sublist]
+
+
+def random_contexts(n_contexts: int, seed: int = 42) -> List[List[Tuple[str, str]]]:
+    """Random BET contexts, of 1 to 6 tokens as with the default 'max_tokens_away'"""
+    rng = random.Random(seed)
+    tags = [tag for class_tags in PTB_TAGS.values() for tag in class_tags] + OTHER_TAGS
+    return [
+        [(f"w{rng.randint(0, 999)}", rng.choice(tags)) for _ in range(rng.randint(1, 6))] for _ in range(n_contexts)
+    ]
+
+
+def main() -> None:  # pylint: disable=missing-function-docstring
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--contexts", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    contexts = random_contexts(args.contexts)
+    expected = [previous_extract_reverb_patterns_tagged_ptb(context) for context in contexts]
+    assert [Reverb.extract_reverb_patterns_tagged_ptb(context) for context in contexts] == expected
+
+    previous = min(
+        timeit.repeat(
+            lambda: [previous_extract_reverb_patterns_tagged_ptb(context) for context in contexts],
+            number=1,
+            repeat=args.repeat,
+        )
+    )
+    compiled = min(
+        timeit.repeat(
+            lambda: [Reverb.extract_reverb_patterns_tagged_ptb(context) for context in contexts],
+            number=1,
+            repeat=args.repeat,
+        )
+    )
+    print(f"{len(contexts)} BET contexts")
+    print(f"previous scanner : {previous:.3f}s, {len(contexts) / previous:,.0f} contexts/s")
+    print(f"compiled matcher : {compiled:.3f}s, {len(contexts) / compiled:,.0f} contexts/s")
+    print(f"speedup          : {previous / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
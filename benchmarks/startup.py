@@ -0,0 +1,64 @@
+"""
+Benchmark of the start-up of Snowball: the time, in a new Python process, to print the help of the command line and
+to import the modules a run needs before any sentence is processed, and which of the slow to import dependencies
+each one imports; NLTK and gensim must only be imported once sentences are processed.
+
+    python benchmarks/startup.py [--repeat N]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+from typing import Dict, List, Tuple
+
+HEAVY_MODULES = ("gensim", "nltk", "scipy")
+
+# the code run in the new process, it reports the time spent and the heavy modules imported on its stderr
+STARTUP = {
+    "snowball --help": "sys.argv = ['snowball', '--help']\nfrom snowball.cli import main\nmain()",
+    "import snowball.bootstrapping": "import snowball.bootstrapping",
+}
+
+TEMPLATE = """
+import json, sys, time
+start = time.perf_counter()
+try:
+{code}
+except SystemExit:
+    pass
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, [name for name in {modules!r} if name in sys.modules]]), file=sys.stderr)
+"""
+
+
+def measure(code: str) -> Tuple[float, List[str]]:
+    """Run the code in a new Python process, returning the seconds it took and the heavy modules it imported"""
+    indented = "\n".join("    " + line for line in code.splitlines())
+    script = TEMPLATE.format(code=indented, modules=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    seconds, modules = json.loads(result.stderr.strip().splitlines()[-1])
+    return seconds, modules
+
+
+def startup_times(repeat: int) -> Dict[str, Tuple[float, List[str]]]:
+    """The median time of each start-up step over 'repeat' runs, and the heavy modules it imports"""
+    results = {}
+    for name, code in STARTUP.items():
+        runs = [measure(code) for _ in range(repeat)]
+        results[name] = (statistics.median(seconds for seconds, _ in runs), runs[0][1])
+    return results
+
+
+def main() -> None:  # pylint: disable=missing-function-docstring
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, (seconds, modules) in startup_times(args.repeat).items():
+        print(f"{name:30} : {seconds:.3f}s, imports {', '.join(modules) or 'none'} of {', '.join(HEAVY_MODULES)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,21 +7,50 @@ import os
 import pickle
 import sys
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional, Tuple
 
-from gensim.matutils import cossim
-from nltk.data import load
+import numpy as np
 from tqdm import tqdm
 
-from snowball.commons import blocks
+from snowball.cache import (
+    CACHE_DIR,
+    MAX_CACHE_SIZE_MB,
+    PROCESSED_TUPLES,
+    VSM_FILE,
+    PreprocessingCache,
+    cache_key,
+    file_digest,
+)
+from snowball.candidates import CandidateTable
+from snowball.collection import Centroids, Collector, Snapshot, collection_pool
 from snowball.config import Config
-from snowball.pattern import Pattern
+from snowball.ingest import MAX_IDF_DRIFT, append_tuples, generate_tuples
+from snowball.pattern import CONTEXTS, Pattern, PatternIndex, patterns_from_arrays, patterns_to_arrays
 from snowball.seed import Seed
-from snowball.sentence import Sentence
+from snowball.similarity import pair_similarity
 from snowball.snowball_tuple import SnowballTuple
+from snowball.tuple_store import TupleStore
 
 PRINT_PATTERNS = False
 
+# file with the state of the bootstrapping after the last completed iteration, see Snowball.save_checkpoint()
+CHECKPOINT_FILE = "checkpoint.npz"
+CHECKPOINT_VERSION = 2
+
+# the configuration parameters which change the bootstrapping, a checkpoint is only resumed with the same ones
+CHECKPOINT_PARAMETERS = (
+    "threshold_similarity",
+    "instance_confidence",
+    "alpha",
+    "beta",
+    "gamma",
+    "w_neg",
+    "w_unk",
+    "w_updt",
+    "min_pattern_support",
+)
+
 
 class Snowball:
     def __init__(
@@ -29,7 +58,6 @@ class Snowball:
         config_file: str,
         seeds_file: str,
         negative_seeds: str,
-        sentences_file: str,
         similarity: float,
         confidence: float,
         n_iterations: int,
@@ -37,17 +65,23 @@ class Snowball:
         # pylint: disable=too-many-arguments
         self.current_iteration: int = 0
         self.patterns: List[Pattern] = []
-        self.processed_tuples: List[SnowballTuple] = []
-        self.candidate_tuples: Dict[SnowballTuple, List[Tuple[Pattern, float]]] = defaultdict(list)
-        self.config = Config(
-            config_file, seeds_file, negative_seeds, sentences_file, similarity, confidence, n_iterations
-        )
+        self.processed_tuples = TupleStore()
+        self.entity_pair_index: Dict[Tuple[int, int], List[int]] = {}
+        self.candidate_tuples = CandidateTable(self.processed_tuples)
+        # cache key of the processed tuples, see generate_tuples() and append_tuples()
+        self.tuples_key: Optional[str] = None
+        self.config = Config(config_file, seeds_file, negative_seeds, similarity, confidence, n_iterations)
+        # hash of the content of the seeds files, identifying the seeds a checkpoint was saved for
+        self.seeds_digest = blake2b(
+            json.dumps([file_digest(path) if path else None for path in (seeds_file, negative_seeds)]).encode("utf8"),
+            digest_size=16,
+        ).hexdigest()
 
     def write_relationships_to_disk(self) -> None:
         """Write extracted relationships to disk"""
         print("\nWriting extracted relationships to disk")
         with open("relationships.jsonl", "wt", encoding="utf8") as f_out:
-            for tpl in self.candidate_tuples.keys():
+            for tpl in self.candidate_tuples:
                 f_out.write(json.dumps(tpl.to_json()) + "\n")
 
     def debug_patterns(self) -> None:
@@ -68,40 +102,48 @@ class Snowball:
 
     def similarity(self, tpl: SnowballTuple, extraction_pattern: Pattern) -> float:
         """
-        Calculate the similarity between a tuple and an extraction pattern
+        Calculate the similarity between a tuple and an extraction pattern, with the same cosine as gensim's cossim()
+        without importing gensim, which a run with the tuples in the cache does not need
         """
-        bef, bet, aft = (0, 0, 0)
-
-        if tpl.bef_vector is not None and extraction_pattern.centroid_bef is not None:
-            bef = cossim(tpl.bef_vector, extraction_pattern.centroid_bef)
-
-        if tpl.bet_vector is not None and extraction_pattern.centroid_bet is not None:
-            bet = cossim(tpl.bet_vector, extraction_pattern.centroid_bet)
-
-        if tpl.aft_vector is not None and extraction_pattern.centroid_aft is not None:
-            aft = cossim(tpl.aft_vector, extraction_pattern.centroid_aft)
-
-        return self.config.alpha * bef + self.config.beta * bet + self.config.gamma * aft
+        return pair_similarity(
+            [tpl.bef_vector, tpl.bet_vector, tpl.aft_vector],
+            [extraction_pattern.centroid_bef, extraction_pattern.centroid_bet, extraction_pattern.centroid_aft],
+            [self.config.alpha, self.config.beta, self.config.gamma],
+        )
 
-    def cluster_tuples(self, matched_tuples: List[SnowballTuple]) -> None:
+    def cluster_tuples(self, matched_tuples: List[int]) -> None:
         """
-        Cluster the matched instances: generate patterns/update patterns.
-        Applies a single-pass clustering algorithm to cluster the matched instances.
+        Cluster the matched instances, given by their position in the processed tuples: generate patterns/update
+        patterns. Applies a single-pass clustering algorithm to cluster the matched instances.
         """
+        # only the contexts with a weight contribute to the similarity, a pattern sharing no term with a tuple in any
+        # of them has a similarity of 0, and would never be chosen over the initial 'max_similarity'
+        contexts = [
+            ctx
+            for ctx, weight in zip(CONTEXTS, (self.config.alpha, self.config.beta, self.config.gamma))
+            if weight != 0
+        ]
+        index = PatternIndex(contexts)
+        for pattern_idx, pattern in enumerate(self.patterns):
+            index.add_pattern(pattern_idx, pattern)
+
         start = 0
         # initialize: if no patterns exist, first tuple goes to first cluster
         if not self.patterns:
-            self.patterns.append(Pattern(matched_tuples[0]))
+            self.patterns.append(Pattern(self.processed_tuples, matched_tuples[0]))
+            index.add_pattern(0, self.patterns[0])
             start = 1
 
         # compute the similarity between an instance with each pattern go through all tuples
         for i in range(start, len(matched_tuples), 1):
-            tpl = matched_tuples[i]
+            tpl = self.processed_tuples[matched_tuples[i]]
+            vectors = {ctx: tpl.get_vector(ctx) for ctx in contexts}
             max_similarity: float = 0.0
             max_similarity_cluster_index: int = 0
 
-            # go through all patterns(clusters of tuples) and find the one with the highest similarity score
-            for pattern_idx in range(0, len(self.patterns), 1):
+            # go through the patterns(clusters of tuples) sharing a term with the tuple, in the same order as all the
+            # patterns, and find the one with the highest similarity score
+            for pattern_idx in index.candidates(vectors):
                 extraction_pattern = self.patterns[pattern_idx]
                 score = self.similarity(tpl, extraction_pattern)
                 if score > max_similarity:
@@ -110,11 +152,13 @@ class Snowball:
 
             # if max_similarity < min_degree_match create a new cluster having this tuple as the centroid
             if max_similarity < self.config.threshold_similarity:
-                self.patterns.append(Pattern(tpl))
+                self.patterns.append(Pattern(self.processed_tuples, matched_tuples[i]))
+                index.add_pattern(len(self.patterns) - 1, self.patterns[-1])
 
             # if max_similarity >= min_degree_match add to the cluster with the highest similarity
             else:
-                self.patterns[max_similarity_cluster_index].add_tuple(tpl)
+                self.patterns[max_similarity_cluster_index].add_tuple(matched_tuples[i])
+                index.add_tuple(max_similarity_cluster_index, self.patterns[max_similarity_cluster_index], vectors)
 
     def _normalize_confidence(self) -> None:
         """
@@ -127,59 +171,193 @@ class Snowball:
             for pattern in self.patterns:
                 pattern.confidence = float(pattern.confidence) / float(max_confidence)
 
-    def match_seeds_tuples(self) -> Tuple[Dict[Tuple[str, str], int], List[SnowballTuple]]:
+    def build_entity_pair_index(self) -> None:
         """
-        Looks for sentences matching the seed instances, checks if an extracted tuple matches seeds tuples.
+        Index the positions of the processed tuples by their pair of entities ids, so the tuples matching a seed are
+        found with a single lookup. The index does not depend on the seeds, it is built once after the tuples are
+        generated or loaded, and is valid for any seeds added in later iterations.
         """
-        matched_tuples: List[SnowballTuple] = []
-        count_matches: Dict[Tuple[str, str], int] = defaultdict(int)
-        for tpl in self.processed_tuples:
-            for seed in self.config.positive_seeds:
-                if tpl.ent1 == seed.ent1 and tpl.ent2 == seed.ent2:
-                    matched_tuples.append(tpl)
-                    count_matches[(tpl.ent1, tpl.ent2)] += 1
+        index: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        store = self.processed_tuples
+        for idx, pair in enumerate(zip(store.ent1.tolist(), store.ent2.tolist())):
+            index[pair].append(idx)
+        self.entity_pair_index = dict(index)
 
+    def match_seeds_tuples(self) -> Tuple[Dict[Tuple[str, str], int], List[int]]:
+        """
+        Looks for sentences matching the seed instances, checks if an extracted tuple matches seeds tuples. Returns the
+        number of matches of each seed and the positions of the matched tuples.
+        """
+        entities = self.processed_tuples.entities
+        matched_tuples: List[int] = []
+        count_matches: Dict[Tuple[str, str], int] = defaultdict(int)
+        for seed in self.config.positive_seeds:
+            ent1, ent2 = entities.get(seed.ent1), entities.get(seed.ent2)
+            if ent1 is None or ent2 is None:
+                continue
+            if positions := self.entity_pair_index.get((ent1, ent2), []):
+                matched_tuples.extend(positions)
+                count_matches[(seed.ent1, seed.ent2)] += len(positions)
+
+        # keep the matched tuples in the order they were generated, the clustering depends on it
+        matched_tuples.sort()
         return count_matches, matched_tuples
 
-    def generate_tuples(self, sentences_file: str) -> None:
+    def generate_tuples(
+        self,
+        sentences_file: str,
+        workers: int = 1,
+        cache_dir: str = CACHE_DIR,
+        max_cache_size_mb: int = MAX_CACHE_SIZE_MB,
+    ) -> None:
         """
-        Generate tuples instances from a text file with sentences where named entities are already tagged
+        Generate tuples instances from a text file with sentences where named entities are already tagged, using
+        'workers' processes. The TF-IDF model is built in the same pass over the sentences.
+
+        The TF-IDF model and the tuples are kept in a cache, and reused only if the content of the sentences file, the
+        configuration parameters which change them, and the version of Snowball are the same, see cache_key().
         """
-        if os.path.exists("processed_tuples.pkl"):
-            with open("processed_tuples.pkl", "rb") as f_in:
-                print("\nLoading processed tuples from disk...")
-                self.processed_tuples = pickle.load(f_in)
-                print(len(self.processed_tuples), "tuples loaded")
-        else:
+        cache = PreprocessingCache(cache_dir, max_cache_size_mb)
+        key = cache_key(sentences_file, self.config)
+        if not self.load_from_cache(cache, key):
             print("\nGenerating relationship instances from sentences")
-            tagger = load("taggers/maxent_treebank_pos_tagger/english.pickle")
-
-            with open(sentences_file, "r", encoding="utf8") as f_in:
-                total = sum(bl.count("\n") for bl in blocks(f_in))
-
-            with open(sentences_file, encoding="utf-8") as f_sentences:
-                for line in tqdm(f_sentences, total=total):
-                    sentence = Sentence(
-                        line.strip(),
-                        self.config.e1_type,
-                        self.config.e2_type,
-                        self.config.max_tokens_away,
-                        self.config.min_tokens_away,
-                        self.config.context_window_size,
-                        tagger,
-                    )
-
-                    for rel in sentence.relationships:
-                        if rel.e1_type == self.config.e1_type and rel.e2_type == self.config.e2_type:
-                            tpl = SnowballTuple(
-                                rel.ent1, rel.ent2, rel.sentence, rel.before, rel.between, rel.after, self.config
-                            )
-                            self.processed_tuples.append(tpl)
-
+            self.processed_tuples = generate_tuples(sentences_file, self.config, workers)
             print(f"\n{len(self.processed_tuples)} relationships generated")
-            print("Dumping relationships to file")
-            with open("processed_tuples.pkl", "wb") as f_out:
-                pickle.dump(self.processed_tuples, f_out)
+            self.save_to_cache(cache, key)
+
+    def append_tuples(  # noqa: PLR0913
+        self,
+        sentences_file: str,
+        workers: int = 1,
+        cache_dir: str = CACHE_DIR,
+        max_cache_size_mb: int = MAX_CACHE_SIZE_MB,
+        max_idf_drift: float = MAX_IDF_DRIFT,
+    ) -> None:
+        # pylint: disable=too-many-arguments
+        """
+        Add the tuples of a file with new sentences to the ones generated by generate_tuples(), or by a previous call
+        to this method, only the new sentences are processed, see ingest.append_tuples().
+
+        The results are cached under a key which also depends on the key of the tuples they were appended to, such that
+        a chain of appended files is reused as long as the files, and the order they were appended, are the same.
+        """
+        if self.tuples_key is None:
+            raise ValueError("the tuples of the sentences to append to must be generated first, see generate_tuples()")
+        cache = PreprocessingCache(cache_dir, max_cache_size_mb)
+        key = cache_key(sentences_file, self.config, parent=self.tuples_key)
+        if not self.load_from_cache(cache, key):
+            print("\nAppending relationship instances from", sentences_file)
+            n_tuples = len(self.processed_tuples)
+            self.processed_tuples = append_tuples(
+                sentences_file, self.config, self.processed_tuples, workers, max_idf_drift
+            )
+            print(f"\n{len(self.processed_tuples) - n_tuples} relationships appended")
+            self.save_to_cache(cache, key)
+
+    def load_from_cache(self, cache: PreprocessingCache, key: str) -> bool:
+        """
+        Load the TF-IDF model and the processed tuples from the cache entry with the given key, if there is one.
+        """
+        if (path := cache.lookup(key)) is None:
+            return False
+        print("\nLoading processed tuples from cache", path)
+        # the TF-IDF model is only unpickled once needed, e.g.: to append sentences, it would import gensim
+        self.config.vsm = None
+        self.config.vsm_file = os.path.join(path, VSM_FILE)
+        self.processed_tuples = TupleStore.load(os.path.join(path, PROCESSED_TUPLES))
+        self.tuples_key = key
+        print(len(self.processed_tuples), "tuples loaded")
+        return True
+
+    def save_to_cache(self, cache: PreprocessingCache, key: str) -> None:
+        """
+        Save the TF-IDF model and the processed tuples in a new cache entry with the given key.
+        """
+        tmp_path = cache.create(key)
+        with open(os.path.join(tmp_path, VSM_FILE), "wb") as f_out:
+            pickle.dump(self.config.vsm, f_out)
+        self.processed_tuples.save(os.path.join(tmp_path, PROCESSED_TUPLES))
+        path = cache.commit(key, tmp_path)
+        self.tuples_key = key
+        print("Processed tuples saved to", os.path.join(path, PROCESSED_TUPLES))
+
+    def tuples_digest(self) -> str:
+        """
+        Hash of the fingerprints of the processed tuples, identifying the tuples a checkpoint was saved for.
+        """
+        fingerprints = np.ascontiguousarray(self.processed_tuples.fingerprint)
+        return blake2b(fingerprints.tobytes(), digest_size=16).hexdigest()
+
+    def checkpoint_parameters(self) -> Dict[str, Any]:
+        """
+        The configuration parameters a checkpoint is saved with, see CHECKPOINT_PARAMETERS.
+        """
+        return {name: getattr(self.config, name) for name in CHECKPOINT_PARAMETERS}
+
+    def save_checkpoint(self, path: str) -> None:
+        """
+        Save the state of the bootstrapping after an iteration to a .npz file: the patterns, including the ones no
+        longer used but whose confidence still counts for the extracted tuples, the extracted tuples and their
+        confidence, the positive seeds and the next iteration. The file is replaced at once, such that an interrupted
+        save never leaves a partial checkpoint behind.
+        """
+        metadata = {
+            "version": CHECKPOINT_VERSION,
+            "iteration": self.current_iteration,
+            "tuples": self.tuples_digest(),
+            "parameters": self.checkpoint_parameters(),
+            "seeds": self.seeds_digest,
+            "positive_seeds": [(seed.ent1, seed.ent2) for seed in self.config.positive_seeds],
+        }
+        arrays: Dict[str, Any] = {"metadata": np.array(json.dumps(metadata))}
+        # the active patterns are registered first, such that the registry saved holds all of them
+        arrays["patterns.active"] = self.candidate_tuples.register_patterns(self.patterns)
+        arrays.update(
+            {f"patterns.{name}": array for name, array in patterns_to_arrays(self.candidate_tuples.patterns).items()}
+        )
+        arrays.update({f"candidates.{name}": array for name, array in self.candidate_tuples.to_arrays().items()})
+        arrays["confidence"] = self.processed_tuples.confidence
+        arrays["confidence_old"] = self.processed_tuples.confidence_old
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f_out:
+            np.savez(f_out, **arrays)
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path: str) -> None:
+        """
+        Restore the state of the bootstrapping saved by save_checkpoint(), for the same processed tuples, seeds files
+        and configuration parameters, see CHECKPOINT_PARAMETERS.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        metadata = json.loads(str(arrays["metadata"]))
+        if metadata["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"checkpoint {path} has version {metadata['version']}, expected {CHECKPOINT_VERSION}")
+        if metadata["tuples"] != self.tuples_digest():
+            raise ValueError(f"checkpoint {path} was saved for different processed tuples")
+        if metadata["seeds"] != self.seeds_digest:
+            raise ValueError(f"checkpoint {path} was saved for different seeds")
+        parameters = self.checkpoint_parameters()
+        if changed := [name for name, value in parameters.items() if metadata["parameters"].get(name) != value]:
+            raise ValueError(f"checkpoint {path} was saved with different parameters: {', '.join(changed)}")
+
+        registry = patterns_from_arrays(
+            self.processed_tuples,
+            {name.split(".", 1)[1]: array for name, array in arrays.items() if name.startswith("patterns.")},
+        )
+        self.patterns = [registry[idx] for idx in arrays["patterns.active"].tolist()]
+        self.candidate_tuples.restore(
+            {name.split(".", 1)[1]: array for name, array in arrays.items() if name.startswith("candidates.")},
+            registry,
+        )
+        self.processed_tuples.confidence[:] = arrays["confidence"]
+        self.processed_tuples.confidence_old[:] = arrays["confidence_old"]
+        for ent1, ent2 in metadata["positive_seeds"]:
+            self.config.add_positive_seed(Seed(ent1, ent2))
+        self.current_iteration = metadata["iteration"]
 
     def _update_seeds(self) -> None:
         """
@@ -188,22 +366,74 @@ class Snowball:
         """
         if self.current_iteration + 1 < self.config.number_iterations:
             print("Adding tuples to seed with confidence =>" + str(self.config.instance_confidence))
-            for seed_tpl in self.candidate_tuples.keys():
+            for seed_tpl in self.candidate_tuples:
                 if seed_tpl.confidence >= self.config.instance_confidence:
                     seed = Seed(seed_tpl.ent1, seed_tpl.ent2)
-                    self.config.positive_seeds.add(seed)
+                    self.config.add_positive_seed(seed)
 
-    def init_bootstrap(self, tuples: Optional[str]) -> None:  # noqa: C901
-        # pylint: disable=too-many-locals, too-many-branches, too-many-statements
+    def score_patterns(self, collect: Collector) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The positions of the tuples, indexes of the patterns and scores of the pairs with a similarity at or above the
+        threshold, sorted by position and pattern, and the selectivity counts of each pattern with the current seeds.
+
+        The tuples are scored by shards over the worker processes of 'collect', against one snapshot of the patterns and
+        seeds, see Collector; the results of the shards are merged in the order of the tuples, the same as if all the
+        tuples were scored at once.
         """
-        Starts a bootstrap iteration
+        centroids = [
+            Centroids(pattern.centroid_bef, pattern.centroid_bet, pattern.centroid_aft) for pattern in self.patterns
+        ]
+        snapshot = Snapshot(centroids, self.config.seed_index, self.config.threshold_similarity)
+        results = list(tqdm(collect(snapshot), total=collect.n_shards))
+
+        comparisons = len(self.processed_tuples) * len(self.patterns)
+        pruned = sum(result.pruned for result in results)
+        print(f"{comparisons} tuple-pattern comparisons: {pruned} pruned")
+
+        positions = np.concatenate([result.positions for result in results] + [np.empty(0, dtype=np.int64)])
+        columns = np.concatenate([result.columns for result in results] + [np.empty(0, dtype=np.int64)])
+        scores = np.concatenate([result.scores for result in results] + [np.empty(0, dtype=np.float64)])
+        counts = sum((result.counts for result in results), np.zeros((len(self.patterns), 3), dtype=np.int64))
+        return positions, columns, scores, counts
+
+    def init_bootstrap(
+        self, tuples: Optional[str], resume: bool = False, checkpoint: str = CHECKPOINT_FILE, workers: int = 1
+    ) -> None:
+        """
+        Starts a bootstrap iteration, a checkpoint is saved to 'checkpoint' after each iteration; if 'resume' is True
+        and there is a checkpoint, the bootstrapping continues from the iteration after the one it was saved for.
+
+        The tuples are scored against the patterns by a pool of 'workers' processes, the results are the same
+        regardless of the number of workers.
         """
         if tuples is not None:
-            with open(tuples, "rb") as f_in:
-                print("Loading pre-processed sentences", tuples)
-                self.processed_tuples = pickle.load(f_in)
-                print(len(self.processed_tuples), "tuples loaded")
+            print("Loading pre-processed sentences", tuples)
+            self.processed_tuples = TupleStore.load(tuples)
+            print(len(self.processed_tuples), "tuples loaded")
+
+        self.build_entity_pair_index()
+        self.candidate_tuples = CandidateTable(self.processed_tuples)
+        if resume:
+            if os.path.exists(checkpoint):
+                self.load_checkpoint(checkpoint)
+                print("Resuming from checkpoint", checkpoint, "at iteration", self.current_iteration)
+            else:
+                print("No checkpoint found at", checkpoint, "starting from the first iteration")
+
+        # the tuples vectors don't change between iterations, only the patterns centroids, each worker process builds
+        # the similarity matrices of the tuples once
+        with collection_pool(
+            self.processed_tuples, self.config.alpha, self.config.beta, self.config.gamma, workers
+        ) as collect:
+            self.bootstrap(collect, checkpoint)
 
+        self.write_relationships_to_disk()
+
+    def bootstrap(self, collect: Collector, checkpoint: str) -> None:
+        # pylint: disable=too-many-locals, too-many-branches, too-many-statements
+        """
+        Run the bootstrap iterations, from the current one, see init_bootstrap().
+        """
         while self.current_iteration <= self.config.number_iterations:
             print("\n=============================================")
             print("\nStarting iteration", self.current_iteration)
@@ -240,62 +470,40 @@ class Snowball:
             # Each candidate tuple will then have a number of patterns that helped generate it,
             # each with an associated degree of match.
             print("\nCollecting instances based on extraction patterns")
-            pattern_best = None
-
-            for processed_tpl in tqdm(self.processed_tuples):
-                sim_best: float = 0.0
-
-                for extraction_pattern in self.patterns:
-                    score = self.similarity(processed_tpl, extraction_pattern)
-                    if score > self.config.threshold_similarity:
-                        extraction_pattern.update_selectivity(processed_tpl, self.config)
-                    if score > sim_best:
-                        sim_best = score
-                        pattern_best = extraction_pattern
-
-                if sim_best >= self.config.threshold_similarity:
-                    # if this instance was already extracted, check if it was by this extraction pattern
-                    patterns = self.candidate_tuples[processed_tpl]
-                    if patterns is not None and pattern_best not in [x[0] for x in patterns]:
-                        self.candidate_tuples[processed_tpl].append((pattern_best, sim_best))  # type: ignore
-
-                    # if this instance was not extracted before, associate this extraction pattern with the instance
-                    # and the similarity score
-                    else:
-                        self.candidate_tuples[processed_tpl].append((pattern_best, sim_best))
-
-                # update extraction pattern confidence
-                extraction_pattern.confidence_old = (  # pylint: disable=undefined-loop-variable
-                    extraction_pattern.confidence  # pylint: disable=undefined-loop-variable
-                )
-                extraction_pattern.update_confidence()  # pylint: disable=undefined-loop-variable
+            pattern_ids = self.candidate_tuples.register_patterns(self.patterns)
+            positions, columns, scores, counts = self.score_patterns(collect)
+
+            # update the selectivity of every pattern with a similarity higher than the threshold, with the counts of
+            # all the tuples it matches at once
+            matched = np.bincount(columns[scores > self.config.threshold_similarity], minlength=len(self.patterns))
+            for idx in np.flatnonzero(matched):
+                positive, negative, unknown = (int(count) for count in counts[idx])
+                self.patterns[idx].add_selectivity(positive, negative, unknown, self.config)
+
+            # each tuple is extracted by the pattern with the highest similarity, all the scores are at or above the
+            # threshold, on ties the first pattern is chosen
+            if len(positions):
+                by_score = np.lexsort((columns, -scores, positions))
+                best = by_score[np.flatnonzero(np.r_[True, np.diff(positions[by_score]) != 0])]
+                self.candidate_tuples.add(positions[best], pattern_ids[columns[best]], scores[best])
+
+            # update extraction pattern confidence, as it has always been done, only for the last pattern
+            if self.processed_tuples:
+                self.patterns[-1].confidence_old = self.patterns[-1].confidence
+                self.patterns[-1].update_confidence()
 
             self._normalize_confidence()
             self.debug_patterns()
 
             # update tuple confidence based on patterns confidence
             print("\nCalculating tuples confidence")
-            for candidate_tpl in list(self.candidate_tuples.keys()):
-                confidence: float = 1.0
-                candidate_tpl.confidence_old = candidate_tpl.confidence
-                for candidate_pattern_score in self.candidate_tuples[candidate_tpl]:
-                    pattern = candidate_pattern_score[0]
-                    score = candidate_pattern_score[1]
-                    confidence *= 1 - (pattern.confidence * score)
-                candidate_tpl.confidence = 1 - confidence
-
-                # use past confidence values to calculate new confidence
-                # if parameter Wupdt < 0.5 the system trusts new examples less on each iteration
-                # which will lead to more conservative patterns and have a damping effect.
-                if self.current_iteration > 0:
-                    candidate_tpl.confidence = (
-                        candidate_tpl.confidence * self.config.w_updt
-                        + candidate_tpl.confidence_old * (1 - self.config.w_updt)
-                    )
+            # use past confidence values to calculate new confidence
+            # if parameter Wupdt < 0.5 the system trusts new examples less on each iteration
+            # which will lead to more conservative patterns and have a damping effect.
+            self.candidate_tuples.update_confidence(self.config.w_updt, damping=self.current_iteration > 0)
 
             self._update_seeds()
 
             # increment the number of iterations
             self.current_iteration += 1
-
-        self.write_relationships_to_disk()
+            self.save_checkpoint(checkpoint)
@@ -0,0 +1,168 @@
+__author__ = "David S. Batista"
+__email__ = "dsbatista@gmail.com"
+
+import json
+import os
+import shutil
+import time
+from hashlib import blake2b
+from importlib.metadata import PackageNotFoundError, version
+from typing import List, Optional, Tuple
+
+from snowball.config import Config
+from snowball.tuple_store import FORMAT_VERSION
+
+# the configuration parameters which change the vector space model or the processed tuples
+KEY_PARAMETERS = (
+    "e1_type",
+    "e2_type",
+    "context_window_size",
+    "max_tokens_away",
+    "min_tokens_away",
+    "use_reverb",
+    "prefilter",
+)
+
+# default location and size limit of the cache
+CACHE_DIR = "snowball_cache"
+MAX_CACHE_SIZE_MB = 10240
+
+# files of each entry: the pickled vector space model and the directory of processed tuples, see TupleStore.save()
+VSM_FILE = "vsm.pkl"
+PROCESSED_TUPLES = "processed_tuples"
+
+# file with the last time an entry was used, which orders the entries for eviction
+LAST_USED = "last_used"
+
+MEGABYTE = 1024 * 1024
+
+
+def package_version() -> str:
+    """
+    The installed version of Snowball, or 'unknown' when running from a source tree which is not installed.
+    """
+    try:
+        return version("snowball-extractor")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def file_digest(path: str, block_size: int = MEGABYTE) -> str:
+    """
+    Hash the content of a file, reading it block-wise.
+    """
+    digest = blake2b(digest_size=16)
+    with open(path, "rb") as f_in:
+        while block := f_in.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(sentences_file: str, config: Config, parent: Optional[str] = None) -> str:
+    """
+    The key of the pre-processing results of a sentences file: a hash of the file content, the configuration parameters
+    which change the results, the version of Snowball and the version of the processed tuples format; and the key of
+    the results the sentences are appended to, if any.
+    """
+    content = {
+        "parent": parent,
+        "sentences": file_digest(sentences_file),
+        "parameters": {name: getattr(config, name) for name in KEY_PARAMETERS},
+        "version": package_version(),
+        "format": FORMAT_VERSION,
+    }
+    return blake2b(json.dumps(content, sort_keys=True).encode("utf8"), digest_size=16).hexdigest()
+
+
+def directory_size(path: str) -> int:
+    """
+    Total size in bytes of the files in a directory tree.
+    """
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+class PreprocessingCache:
+    """
+    A directory with the results of pre-processing sentences files, i.e.: the vector space model and the processed
+    tuples, one sub-directory per cache key, see cache_key(). An entry is only reused if it was generated from the same
+    file content, with the same configuration parameters and version of Snowball; the least recently used entries are
+    evicted once the total size goes over 'max_size_mb' megabytes.
+    """
+
+    def __init__(self, cache_dir: str, max_size_mb: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * MEGABYTE
+
+    def path(self, key: str) -> str:
+        """
+        The directory of the entry with the given key.
+        """
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        The directory of the entry with the given key, marked as used, or None if there is no such entry.
+        """
+        path = self.path(key)
+        if not os.path.isdir(path):
+            return None
+        self.touch(path)
+        return path
+
+    def create(self, key: str) -> str:
+        """
+        A new, empty, directory where to write an entry, to be passed to commit() once all the files are written.
+        """
+        tmp_path = self.path(key) + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        return tmp_path
+
+    def commit(self, key: str, tmp_path: str) -> str:
+        """
+        Move an entry written in the directory given by create() to its place in the cache, and evict the least
+        recently used entries if the cache is over its size limit.
+        """
+        path = self.path(key)
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp_path, path)
+        self.touch(path)
+        self.evict(keep=key)
+        return path
+
+    @staticmethod
+    def touch(path: str) -> None:
+        """
+        Mark an entry as used now.
+        """
+        with open(os.path.join(path, LAST_USED), "wt", encoding="utf8") as f_out:
+            f_out.write(str(time.time()))
+
+    def entries(self) -> List[Tuple[float, str, int]]:
+        """
+        The (last used time, key, size) of each entry in the cache, least recently used first.
+        """
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            path = self.path(key)
+            last_used = os.path.join(path, LAST_USED)
+            if key.endswith(".tmp") or not os.path.exists(last_used):
+                continue
+            with open(last_used, encoding="utf8") as f_in:
+                entries.append((float(f_in.read()), key, directory_size(path)))
+        return sorted(entries)
+
+    def evict(self, keep: str) -> None:
+        """
+        Remove the least recently used entries, except 'keep', until the cache size is within the limit.
+        """
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            print(f"Evicting cache entry {key}")
+            shutil.rmtree(self.path(key))
+            total -= size
@@ -0,0 +1,121 @@
+__author__ = "David S. Batista"
+__email__ = "dsbatista@gmail.com"
+
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from snowball.pattern import Pattern
+from snowball.snowball_tuple import SnowballTuple
+from snowball.tuple_store import TupleStore
+
+
+class CandidateTable:
+    """
+    The candidate tuples, i.e.: the tuples extracted by the patterns, and the pattern and similarity score of each
+    extraction, stored as parallel arrays of tuple ids, pattern ids and scores.
+
+    Equal tuples share the same id, the position of the first one in the processed tuples; a pattern id is the position
+    of the pattern in the table's patterns registry, which keeps patterns discarded in later iterations, since their
+    extractions still count for the confidence of the tuples.
+    """
+
+    def __init__(self, tuples: TupleStore) -> None:
+        self.tuples = tuples
+        # equal tuples have the same fingerprint, np.unique() gives the position of the first one with each fingerprint
+        _, first, inverse = np.unique(tuples.fingerprint, axis=0, return_index=True, return_inverse=True)
+        self.tuple_ids = first.astype(np.int64)[inverse.ravel()]
+        self.patterns: List[Pattern] = []
+        self.pattern_ids: Dict[int, int] = {}
+        self.extracted = np.zeros(len(tuples), dtype=bool)
+        self.order: List[np.ndarray] = []
+        self.columns: Dict[str, List[np.ndarray]] = {"tuple": [], "pattern": [], "score": []}
+
+    def __len__(self) -> int:
+        return int(self.extracted.sum())
+
+    def __iter__(self) -> Iterator[SnowballTuple]:
+        """
+        The extracted tuples, in the order they were first extracted.
+        """
+        for ids in self.order:
+            for tuple_id in ids:
+                yield self.tuples[int(tuple_id)]
+
+    def register_patterns(self, patterns: Sequence[Pattern]) -> np.ndarray:
+        """
+        Return the ids of the given patterns, registering the ones not seen before.
+        """
+        for pattern in patterns:
+            if id(pattern) not in self.pattern_ids:
+                self.pattern_ids[id(pattern)] = len(self.patterns)
+                self.patterns.append(pattern)
+        return np.array([self.pattern_ids[id(pattern)] for pattern in patterns], dtype=np.int64)
+
+    def add(self, positions: np.ndarray, pattern_ids: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Add the extractions of the processed tuples at 'positions' by the patterns with 'pattern_ids'; every extraction
+        is kept, also of a tuple, or an equal tuple, already extracted by the same pattern, in this or in a previous
+        iteration, each one counts for the confidence of the tuple.
+        """
+        if not len(positions):
+            return
+        tuple_ids = self.tuple_ids[positions]
+        self.columns["tuple"].append(tuple_ids)
+        self.columns["pattern"].append(pattern_ids)
+        self.columns["score"].append(scores)
+
+        fresh = tuple_ids[~self.extracted[tuple_ids]]
+        _, first = np.unique(fresh, return_index=True)
+        fresh = fresh[np.sort(first)]
+        self.extracted[fresh] = True
+        self.order.append(fresh)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The extractions as arrays, the patterns registry must be saved separately, see restore().
+        """
+        arrays = {name: np.concatenate(chunks + [np.empty(0)]) for name, chunks in self.columns.items()}
+        arrays["tuple"] = arrays["tuple"].astype(np.int64)
+        arrays["pattern"] = arrays["pattern"].astype(np.int64)
+        arrays["order"] = np.concatenate(self.order + [np.empty(0, dtype=np.int64)])
+        return arrays
+
+    def restore(self, arrays: Dict[str, np.ndarray], patterns: Sequence[Pattern]) -> None:
+        """
+        Replace the extractions and the patterns registry with the ones given by to_arrays(), for the same tuples.
+        """
+        self.patterns = []
+        self.pattern_ids = {}
+        self.register_patterns(patterns)
+        self.order = [arrays["order"]] if len(arrays["order"]) else []
+        self.extracted = np.zeros(len(self.tuples), dtype=bool)
+        self.extracted[arrays["order"]] = True
+        self.columns = {name: [arrays[name]] if len(arrays[name]) else [] for name in self.columns}
+
+    def update_confidence(self, w_updt: float, damping: bool) -> None:
+        """
+        Update the confidence of the extracted tuples with the current confidence of the patterns which extracted them:
+
+            Conf(T) = 1 - Π(1 - Conf(P) * score(T, P))
+
+        if 'damping' is True, the new confidence is weighted by 'w_updt' with the one of the previous iteration.
+        """
+        if not self.order:
+            return
+        columns = {name: np.concatenate(chunks) for name, chunks in self.columns.items()}
+        self.columns = {name: [column] for name, column in columns.items()}
+
+        patterns_confidence = np.array([pattern.confidence for pattern in self.patterns], dtype=np.float64)
+        factors = 1.0 - patterns_confidence[columns["pattern"]] * columns["score"]
+        by_tuple = np.argsort(columns["tuple"], kind="stable")
+        tuple_ids = columns["tuple"][by_tuple]
+        starts = np.flatnonzero(np.r_[True, tuple_ids[1:] != tuple_ids[:-1]])
+        ids = tuple_ids[starts]
+
+        # the confidences are kept in the store arrays
+        confidence = 1.0 - np.multiply.reduceat(factors[by_tuple], starts)
+        self.tuples.confidence_old[ids] = self.tuples.confidence[ids]
+        if damping:
+            confidence = confidence * w_updt + self.tuples.confidence_old[ids] * (1 - w_updt)
+        self.tuples.confidence[ids] = confidence
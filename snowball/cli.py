@@ -1,7 +1,9 @@
+import os
 import sys
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 
-from snowball.bootstrapping import Snowball
+from snowball.cache import CACHE_DIR, MAX_CACHE_SIZE_MB
+from snowball.ingest import MAX_IDF_DRIFT
 
 
 def create_args() -> ArgumentParser:  # pylint: disable=missing-function-docstring
@@ -12,7 +14,8 @@ def create_args() -> ArgumentParser:  # pylint: disable=missing-function-docstri
     parser.add_argument("--config", help="file with bootstrapping configuration parameters", type=str, required=False)
     parser.add_argument(
         "--sentences",
-        help="a text file with a sentence per line, and with at least two entities per sentence",
+        help="a text file with a sentence per line, and with at least two entities per sentence, or a directory of "
+        "processed tuples",
         type=str,
         required=True,
     )
@@ -47,6 +50,53 @@ def create_args() -> ArgumentParser:  # pylint: disable=missing-function-docstri
         required=False,
         default=2,
     )
+    parser.add_argument(
+        "--workers",
+        help="number of processes used to generate the relationship instances from the sentences, and to match them "
+        "against the patterns",
+        type=int,
+        required=False,
+        default=1,
+    )
+    parser.add_argument(
+        "--append",
+        help="text files with new sentences, processed in the given order and added to the ones in '--sentences', "
+        "only the new sentences are processed if the previous ones are cached",
+        type=str,
+        nargs="+",
+        required=False,
+        default=[],
+    )
+    parser.add_argument(
+        "--idf_drift",
+        help="maximum relative change of the IDF of a term, when appending sentences, before the TF-IDF vectors of "
+        "the sentences already processed are computed again",
+        type=float,
+        required=False,
+        default=MAX_IDF_DRIFT,
+    )
+    parser.add_argument(
+        "--cache_dir",
+        help="directory where the processed sentences are cached, to be reused by runs with the same sentences file "
+        "and parameters",
+        type=str,
+        required=False,
+        default=CACHE_DIR,
+    )
+    parser.add_argument(
+        "--cache_size",
+        help="maximum size of the cache in megabytes, the least recently used entries are removed to stay within it",
+        type=int,
+        required=False,
+        default=MAX_CACHE_SIZE_MB,
+    )
+    parser.add_argument(
+        "--resume",
+        help="continue from the checkpoint saved after the last completed iteration of a previous run, with the same "
+        "sentences",
+        action="store_true",
+        required=False,
+    )
 
     return parser
 
@@ -57,22 +107,29 @@ def main() -> None:  # pylint: disable=missing-function-docstring
         parser.print_help(sys.stderr)
         sys.exit(1)
     args = parser.parse_args()
+    if args.append and os.path.isdir(args.sentences):
+        parser.error("--append requires a sentences file, not a directory of processed tuples")
+
+    # imported only once the arguments are parsed, printing the help does not import NumPy, SciPy, etc.
+    from snowball.bootstrapping import Snowball  # noqa: PLC0415
+
     snowball = Snowball(
         args.config,
         args.positive_seeds,
         args.negative_seeds,
-        args.sentences,
         args.similarity,
         args.confidence,
         args.iterations,
     )
 
-    if args.sentences.endswith(".pkl"):
+    if os.path.isdir(args.sentences):
         print("Loading pre-processed sentences", args.sentences)
-        snowball.init_bootstrap(args.sentences)
+        snowball.init_bootstrap(args.sentences, resume=args.resume, workers=args.workers)
     else:
-        snowball.generate_tuples(args.sentences)
-        snowball.init_bootstrap(tuples=None)
+        snowball.generate_tuples(args.sentences, args.workers, args.cache_dir, args.cache_size)
+        for sentences_file in args.append:
+            snowball.append_tuples(sentences_file, args.workers, args.cache_dir, args.cache_size, args.idf_drift)
+        snowball.init_bootstrap(tuples=None, resume=args.resume, workers=args.workers)
 
 
 if __name__ == "__main__":
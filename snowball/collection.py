@@ -0,0 +1,215 @@
+__author__ = "David S. Batista"
+__email__ = "dsbatista@gmail.com"
+
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+from multiprocessing import Pool
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from snowball.seed import SeedIndex
+from snowball.similarity import SimilarityEngine
+from snowball.tuple_store import TupleStore
+
+# number of shards of the tuples scored by each worker process in an iteration, more shards balance the work better
+SHARDS_PER_WORKER = 4
+
+# per-process state, so that each worker receives the tuples and builds their similarity matrices only once, and the
+# centroids matrices once per snapshot
+_worker_state: Dict[str, Any] = {}
+
+
+class Centroids(NamedTuple):
+    """
+    The centroids of a pattern, a snapshot of the pattern which is sent to the worker processes.
+    """
+
+    centroid_bef: Optional[List[Tuple[int, float]]]
+    centroid_bet: Optional[List[Tuple[int, float]]]
+    centroid_aft: Optional[List[Tuple[int, float]]]
+
+
+class Snapshot(NamedTuple):
+    """
+    The patterns, as their centroids, the seeds and the similarity threshold the tuples are scored against in an
+    iteration, the same for all the shards.
+    """
+
+    centroids: List[Centroids]
+    seed_index: SeedIndex
+    threshold: float
+
+
+class Shard(NamedTuple):
+    """
+    The tuples in [start, end) to score against the snapshot with the given number, see Collector.
+    """
+
+    start: int
+    end: int
+    snapshot: int
+
+
+class ShardResult(NamedTuple):
+    """
+    The (tuple, pattern, score) triples of a shard with a score at or above the threshold, sorted by tuple and pattern,
+    the selectivity counts (positive, negative, unknown) of each pattern from the triples with a score above the
+    threshold, and the number of (tuple, pattern) pairs not scored because of the upper bound of their similarity.
+    """
+
+    positions: np.ndarray
+    columns: np.ndarray
+    scores: np.ndarray
+    counts: np.ndarray
+    pruned: int
+
+
+def snapshot_file(directory: str, number: int) -> str:
+    """
+    The file a snapshot is written to for the worker processes.
+    """
+    return os.path.join(directory, f"snapshot-{number}.pkl")
+
+
+def init_worker(tuples: TupleStore, alpha: float, beta: float, gamma: float, directory: Optional[str]) -> None:
+    """
+    Keep the tuples, and build the similarity engine over their vectors, in the worker process; the snapshots of each
+    iteration are read from 'directory'.
+    """
+    _worker_state["tuples"] = tuples
+    _worker_state["engine"] = SimilarityEngine(tuples, alpha, beta, gamma)
+    _worker_state["directory"] = directory
+    _worker_state["snapshot"] = None
+
+
+def set_snapshot(number: int, snapshot: Snapshot) -> None:
+    """
+    Build the centroids matrices of the patterns of a snapshot, once for all the shards scored against it.
+    """
+    _worker_state["engine"].set_patterns(snapshot.centroids)
+    _worker_state["snapshot"] = (number, snapshot)
+
+
+def load_snapshot(number: int) -> Snapshot:
+    """
+    The snapshot with the given number, read from its file the first time a shard of it is scored in the process.
+    """
+    if _worker_state["snapshot"] is None or _worker_state["snapshot"][0] != number:
+        with open(snapshot_file(_worker_state["directory"], number), "rb") as f_in:
+            set_snapshot(number, pickle.load(f_in))
+    snapshot: Snapshot = _worker_state["snapshot"][1]
+    return snapshot
+
+
+def shards(n_tuples: int, snapshot: int, workers: int) -> List[Shard]:
+    """
+    Split the tuples into contiguous shards, each to be scored by a worker against the same snapshot of the patterns.
+    """
+    bounds = np.linspace(0, n_tuples, max(1, workers) * SHARDS_PER_WORKER + 1, dtype=np.int64)
+    return [Shard(int(start), int(end), snapshot) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+class Collector:
+    """
+    Scores all the tuples against a snapshot of the patterns, by shards, with a pool of worker processes kept across
+    the bootstrap iterations, yielding the results in the order of the shards.
+
+    The tuples are sent once to each worker, when the pool starts, and each snapshot is pickled once, to a file which
+    each worker reads before scoring its first shard of the iteration, instead of being sent with every shard.
+    """
+
+    def __init__(self, n_tuples: int, workers: int, pool: Optional[Any] = None, directory: Optional[str] = None):
+        self.n_tuples = n_tuples
+        self.workers = workers
+        self.pool = pool
+        self.directory = directory
+        self.snapshots = 0
+        self.n_shards = len(shards(n_tuples, 0, workers))
+
+    def __call__(self, snapshot: Snapshot) -> Iterator[ShardResult]:
+        number, self.snapshots = self.snapshots, self.snapshots + 1
+        tasks = shards(self.n_tuples, number, self.workers)
+        if self.pool is None or self.directory is None:
+            set_snapshot(number, snapshot)
+            return map(score_shard, tasks)
+
+        path = snapshot_file(self.directory, number)
+        with open(path + ".tmp", "wb") as f_out:
+            pickle.dump(snapshot, f_out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        # the shards of the previous snapshot were all scored
+        if number > 0:
+            os.remove(snapshot_file(self.directory, number - 1))
+        results: Iterator[ShardResult] = self.pool.imap(score_shard, tasks)
+        return results
+
+
+@contextmanager
+def collection_pool(tuples: TupleStore, alpha: float, beta: float, gamma: float, workers: int) -> Iterator[Collector]:
+    """
+    A Collector with a pool of 'workers' processes, or scoring the tuples in this process if 'workers' is 1.
+    """
+    if workers > 1:
+        with (
+            tempfile.TemporaryDirectory(prefix="snowball-") as directory,
+            Pool(workers, initializer=init_worker, initargs=(tuples, alpha, beta, gamma, directory)) as pool,
+        ):
+            yield Collector(len(tuples), workers, pool, directory)
+    else:
+        init_worker(tuples, alpha, beta, gamma, None)
+        yield Collector(len(tuples), workers)
+
+
+def selectivity_counts(
+    tuples: TupleStore, seed_index: SeedIndex, positions: np.ndarray, columns: np.ndarray, n_patterns: int
+) -> np.ndarray:
+    """
+    The number of positive, negative and unknown matches against the seeds of the tuples matched by each pattern, as
+    Pattern.update_selectivity() adds them, given the positions of the tuples and the indexes of the patterns.
+    """
+    counts = np.zeros((n_patterns, 3), dtype=np.int64)
+    if not len(positions):
+        return counts
+    # each tuple is matched against the seeds once, even if many patterns match it
+    unique, inverse = np.unique(positions, return_inverse=True)
+    matches = np.array(
+        [
+            seed_index.classify(tuples.entities[tuples.ent1[position]], tuples.entities[tuples.ent2[position]])
+            for position in unique
+        ],
+        dtype=np.int64,
+    )
+    np.add.at(counts, columns, matches[inverse])
+    return counts
+
+
+def score_shard(shard: Shard) -> ShardResult:
+    """
+    Score the tuples of a shard against the patterns, skipping the tuples whose upper bound of the similarity is below
+    the threshold, in blocks of at most BLOCK_SCORES scores; the scores at the threshold are the pairwise ones.
+    """
+    engine, tuples = _worker_state["engine"], _worker_state["tuples"]
+    snapshot = load_snapshot(shard.snapshot)
+    found: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+    pruned = 0
+    block_size = engine.block_size()
+    for start in range(shard.start, shard.end, block_size):
+        end = min(start + block_size, shard.end)
+        positions = engine.candidates(start, end, snapshot.threshold)
+        pruned += (end - start - len(positions)) * len(snapshot.centroids)
+        if not len(positions):
+            continue
+        scores = engine.scores_of(positions)
+        engine.rescore_ties(positions, scores, snapshot.threshold)
+        rows, columns = np.nonzero(scores >= snapshot.threshold)
+        found.append((positions[rows], columns.astype(np.int64), scores[rows, columns]))
+
+    positions = np.concatenate([positions for positions, _, _ in found] + [np.empty(0, dtype=np.int64)])
+    columns = np.concatenate([columns for _, columns, _ in found] + [np.empty(0, dtype=np.int64)])
+    scores = np.concatenate([scores for _, _, scores in found] + [np.empty(0, dtype=np.float64)])
+    above = scores > snapshot.threshold
+    counts = selectivity_counts(tuples, snapshot.seed_index, positions[above], columns[above], len(snapshot.centroids))
+    return ShardResult(positions, columns, scores, counts, pruned)
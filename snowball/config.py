@@ -2,16 +2,15 @@ __author__ = "David S. Batista"
 __email__ = "dsbatista@gmail.com"
 
 import fileinput
-import os
 import pickle
-from typing import Any, Set
-
-from nltk.corpus import stopwords
+from typing import Any, Optional, Set
 
 from snowball.reverb_breds import Reverb
-from snowball.seed import Seed
+from snowball.seed import Seed, SeedIndex
 from snowball.vector_space_model import VectorSpaceModel
 
+POS_BATCH_SIZE = 256
+
 
 class Config:
     # pylint: disable=too-many-instance-attributes
@@ -24,12 +23,16 @@ class Config:
         config_file: str,
         positive_seeds: str,
         negative_seeds: str,
-        sentences_file: str,
         similarity: float,
         confidence: float,
         n_iterations: int,
     ) -> None:  # noqa: C901
         # pylint: disable=too-many-arguments, too-many-statements
+        # number of sentences PoS-tagged at once, it does not change the results, only the speed of the pre-processing
+        self.pos_batch_size: int = POS_BATCH_SIZE
+        # skip the sentences which cannot have a relationship before tokenizing them, they are then also left out of
+        # the TF-IDF model, which changes the weights of the vectors
+        self.prefilter: bool = False
         if config_file is None:
             self.context_window_size: int = 2
             self.min_tokens_away: int = 1
@@ -49,14 +52,17 @@ class Config:
         self.negative_seeds: Set[Seed] = set()
         self.e1_type: str
         self.e2_type: str
-        self.stopwords: Set[str] = set(stopwords.words("english"))
+        # the stopwords, ReVerb and the TF-IDF model load NLTK or gensim resources, they are only loaded once used,
+        # e.g.: not when the tuples are loaded from the cache
+        self._stopwords: Optional[Set[str]] = None
         self.threshold_similarity: float = similarity
         self.instance_confidence: float = confidence
-        self.reverb: "Reverb" = Reverb()
+        self._reverb: Optional[Reverb] = None
         self.number_iterations = n_iterations
         self.read_seeds(positive_seeds, self.positive_seeds)
         if negative_seeds:
             self.read_seeds(negative_seeds, self.negative_seeds)
+        self.seed_index = SeedIndex(self.positive_seeds, self.negative_seeds)
 
         print("\nConfiguration parameters")
         print("========================")
@@ -66,6 +72,8 @@ class Config:
         print("max tokens away      :", self.max_tokens_away)
         print("min tokens away      :", self.min_tokens_away)
         print("use ReVerb           :", self.use_reverb)
+        print("PoS-tag batch size   :", self.pos_batch_size)
+        print("pre-filter sentences :", self.prefilter)
         print("")
         print("alpha                :", self.alpha)
         print("beta                 :", self.beta)
@@ -83,15 +91,46 @@ class Config:
         print("iteration wUpdt      :", self.w_updt)
         print("\n")
 
-        if os.path.exists("vsm.pkl"):
-            print("\nLoading TF-IDF model from disk...")
-            with open("vsm.pkl", "rb") as f_in:
-                self.vsm = pickle.load(f_in)
-        else:
-            print("\nGenerating tf-idf model from sentences...")
-            self.vsm = VectorSpaceModel(sentences_file, self.stopwords)
-            with open("vsm.pkl", "wb") as f_out:
-                pickle.dump(self.vsm, f_out)
+        # the TF-IDF model is built while the sentences are processed, or loaded from the cache, see
+        # Snowball.generate_tuples()
+        self._vsm: Optional[VectorSpaceModel] = None
+        self.vsm_file: Optional[str] = None
+
+    @property
+    def stopwords(self) -> Set[str]:
+        """
+        The English stopwords of NLTK.
+        """
+        if self._stopwords is None:
+            from nltk.corpus import stopwords  # noqa: PLC0415
+
+            self._stopwords = set(stopwords.words("english"))
+        return self._stopwords
+
+    @property
+    def reverb(self) -> Reverb:
+        """
+        The ReVerb extractor, with the WordNet lemmatizer used to detect the passive voice.
+        """
+        if self._reverb is None:
+            self._reverb = Reverb()
+        return self._reverb
+
+    @property
+    def vsm(self) -> Optional[VectorSpaceModel]:
+        """
+        The TF-IDF model, if it was pickled to 'vsm_file' it is only unpickled now.
+        """
+        if self._vsm is None and self.vsm_file is not None:
+            with open(self.vsm_file, "rb") as f_in:
+                self._vsm = pickle.load(f_in)
+            self.vsm_file = None
+        return self._vsm
+
+    @vsm.setter
+    def vsm(self, vsm: Optional[VectorSpaceModel]) -> None:
+        self._vsm = vsm
+        self.vsm_file = None
 
     def read_seeds(self, seeds_file: str, holder: Set[Any]) -> None:
         """
@@ -110,6 +149,14 @@ class Config:
                 seed = Seed(ent1, ent2)
                 holder.add(seed)
 
+    def add_positive_seed(self, seed: Seed) -> None:
+        """
+        Adds a new positive seed, keeping the seeds index up to date.
+        """
+        if seed not in self.positive_seeds:
+            self.positive_seeds.add(seed)
+            self.seed_index.add_positive(seed)
+
     def read_config(self, config_file: str) -> None:  # noqa: C901
         # pylint: disable=too-many-branches
         """
@@ -147,6 +194,12 @@ class Config:
             if line.startswith("similarity"):
                 self.similarity = float(line.split("=")[1].strip())
 
+            if line.startswith("prefilter"):
+                self.prefilter = True
+
+            if line.startswith("pos_batch_size"):
+                self.pos_batch_size = int(line.split("=")[1])
+
             if line.startswith("alpha"):
                 self.alpha = float(line.split("=")[1])
 
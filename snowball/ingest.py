@@ -0,0 +1,289 @@
+__author__ = "David S. Batista"
+__email__ = "dsbatista@gmail.com"
+
+import os
+import time
+from multiprocessing import Pool
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from snowball.config import Config
+from snowball.sentence import Relationship, Sentence, may_have_relationship
+from snowball.snowball_tuple import ContextDocumentCache
+from snowball.tuple_store import CONTEXTS, TupleStore
+from snowball.vector_space_model import VectorSpaceModel
+
+POS_TAGGER = "taggers/maxent_treebank_pos_tagger/english.pickle"
+
+# size in bytes of each chunk of the sentences file handed to a worker
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# maximum relative change of the IDF of any term, when appending sentences, before the TF-IDF vectors of the tuples
+# already generated are computed again
+MAX_IDF_DRIFT = 0.05
+
+# statistics of the pre-processing of each chunk, summed over all the chunks
+INGEST_STATS = ("sentences", "skipped", "tagged_sentences", "tagged_tokens", "tagging_time")
+
+# per-process state, so that each worker loads the tagger and receives the configuration and the VSM only once
+_worker_state: Dict[str, Any] = {}
+
+
+def chunk_offsets(sentences_file: str, n_chunks: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into at most 'n_chunks' byte ranges (start, end), each range starting at the beginning of a line.
+    """
+    size = os.path.getsize(sentences_file)
+    boundaries = [0]
+    with open(sentences_file, "rb") as f_in:
+        for i in range(1, n_chunks):
+            pos = i * size // n_chunks
+            if pos <= boundaries[-1]:
+                continue
+            # move to the first line starting at or after 'pos'
+            f_in.seek(pos - 1)
+            f_in.readline()
+            if boundaries[-1] < f_in.tell() < size:
+                boundaries.append(f_in.tell())
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def read_lines(sentences_file: str, start: int, end: int) -> Generator[str, None, None]:
+    """
+    Read the lines starting in the byte range [start, end) of a file.
+    """
+    with open(sentences_file, "rb") as f_in:
+        f_in.seek(start)
+        pos = start
+        while pos < end:
+            line = f_in.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield line.decode("utf8")
+
+
+def init_worker(config: Config) -> None:
+    """
+    Keep a reference to the configuration (and the VSM it holds) in the worker process, and start an empty cache of
+    the terms of the contexts.
+    """
+    _worker_state["config"] = config
+    _worker_state["contexts"] = ContextDocumentCache(config)
+
+
+def tag_sentences(sentences: List[Sentence], tagger: Any) -> float:
+    """
+    PoS-tag a batch of sentences at once and create their relationships, returning the time spent tagging.
+    """
+    start = time.perf_counter()
+    tagged = tagger.tag_sents([sentence.text_tokens for sentence in sentences])
+    elapsed = time.perf_counter() - start
+    for sentence, tagged_text in zip(sentences, tagged):
+        sentence.add_tagged_text(tagged_text)
+    return elapsed
+
+
+def ingest_chunk(bounds: Tuple[str, int, int]) -> Tuple[List[List[str]], List[Relationship], Dict[str, float]]:
+    """
+    Read and tokenize each sentence in a chunk of the sentences file only once, returning the documents to build or
+    update the vector space model, the relationships found between entities of the seeds types, and the statistics of
+    the chunk, see INGEST_STATS.
+
+    Only the sentences with a pair of entities which can form a relationship are PoS-tagged, in batches of
+    'pos_batch_size' sentences; if 'prefilter' is set the sentences which cannot have a relationship are skipped
+    before being tokenized, see may_have_relationship().
+    """
+    sentences_file, start, end = bounds
+    config = _worker_state["config"]
+    if "tagger" not in _worker_state:
+        from nltk.data import load  # noqa: PLC0415
+
+        _worker_state["tagger"] = load(POS_TAGGER)
+    documents = []
+    to_tag = []
+    stats = dict.fromkeys(INGEST_STATS, 0.0)
+    for line in read_lines(sentences_file, start, end):
+        stats["sentences"] += 1
+        if config.prefilter and not may_have_relationship(line, config.e1_type, config.e2_type, config.max_tokens_away):
+            stats["skipped"] += 1
+            continue
+        sentence = Sentence(
+            line.strip(),
+            config.e1_type,
+            config.e2_type,
+            config.max_tokens_away,
+            config.min_tokens_away,
+            config.context_window_size,
+        )
+        documents.append(VectorSpaceModel.document(sentence.context_tokens(), config.stopwords))
+        if sentence.pairs:
+            to_tag.append(sentence)
+
+    for i in range(0, len(to_tag), config.pos_batch_size):
+        stats["tagging_time"] += tag_sentences(to_tag[i : i + config.pos_batch_size], _worker_state["tagger"])
+    relationships = [
+        rel
+        for sentence in to_tag
+        for rel in sentence.relationships
+        if rel.e1_type == config.e1_type and rel.e2_type == config.e2_type
+    ]
+    stats["tagged_sentences"] = len(to_tag)
+    stats["tagged_tokens"] = sum(len(sentence.text_tokens) for sentence in to_tag)
+    return documents, relationships, stats
+
+
+def vectorize_chunk(relationships: List[Relationship]) -> Tuple[TupleStore, Tuple[int, int]]:
+    """
+    Create the tuples, i.e.: the TF-IDF vectors for the contexts, of a chunk of relationships, returning also the
+    number of lookups and hits of the contexts cache while doing it.
+
+    The terms of each context are extracted, or taken from the cache, for each relationship, and then the vectors of
+    each of the BEF, BET and AFT contexts of the whole chunk are built at once.
+    """
+    config, contexts = _worker_state["config"], _worker_state["contexts"]
+    lookups, hits = contexts.stats()
+    store = TupleStore()
+    documents: List[List[Any]] = [[] for _ in CONTEXTS]
+    for rel in relationships:
+        rel_documents, passive_voice = contexts.context_documents(rel.before, rel.between, rel.after)
+        store.add(rel.ent1, rel.ent2, rel.sentence, (rel.before, rel.between, rel.after), (None,) * 3, passive_voice)
+        for ctx_documents, document in zip(documents, rel_documents):
+            ctx_documents.append(document)
+    for ctx, ctx_documents in zip(CONTEXTS, documents):
+        none = np.array([document is None for document in ctx_documents], dtype=bool)
+        store.set_vectors(ctx, config.vsm.vectorize([document or () for document in ctx_documents]), none)
+    total_lookups, total_hits = contexts.stats()
+    return store, (total_lookups - lookups, total_hits - hits)
+
+
+def map_chunks(function: Callable[[Any], Any], chunks: List[Any], config: Config, workers: int) -> Iterator[Any]:
+    """
+    Apply a function to each chunk, with a pool of 'workers' processes, yielding the results in the chunks order.
+    """
+    if workers > 1:
+        with Pool(workers, initializer=init_worker, initargs=(config,)) as pool:
+            yield from pool.imap(function, chunks)
+    else:
+        init_worker(config)
+        yield from map(function, chunks)
+
+
+def ingest(sentences_file: str, config: Config, vsm: Optional[VectorSpaceModel], workers: int) -> List[Relationship]:
+    """
+    Read the sentences file, in chunks processed by a pool of 'workers' processes, adding the documents to the vector
+    space model, if given, and returning the relationships in the order they occur in the file.
+    """
+    n_chunks = max(workers * 4, os.path.getsize(sentences_file) // CHUNK_SIZE)
+    chunks = [(sentences_file, start, end) for start, end in chunk_offsets(sentences_file, n_chunks)]
+    relationships: List[Relationship] = []
+    stats = dict.fromkeys(INGEST_STATS, 0.0)
+
+    with tqdm(total=os.path.getsize(sentences_file), unit="B", unit_scale=True) as progress:
+        for (_, start, end), (documents, chunk_relationships, chunk_stats) in zip(
+            chunks, map_chunks(ingest_chunk, chunks, config, workers)
+        ):
+            if vsm is not None:
+                vsm.add_documents(documents)
+            relationships.extend(chunk_relationships)
+            for name, value in chunk_stats.items():
+                stats[name] += value
+            progress.update(end - start)
+
+    if config.prefilter and stats["sentences"]:
+        print(
+            f"Pre-filter skipped {int(stats['skipped'])} of {int(stats['sentences'])} sentences "
+            f"({100 * stats['skipped'] / stats['sentences']:.1f}%)"
+        )
+    # the time is summed over all the workers, the throughput is the one of a single process
+    if stats["tagging_time"] > 0:
+        print(
+            f"PoS-tagged {int(stats['tagged_sentences'])} sentences, {int(stats['tagged_tokens'])} tokens, in batches "
+            f"of {config.pos_batch_size}: {stats['tagged_sentences'] / stats['tagging_time']:.1f} sentences/s, "
+            f"{stats['tagged_tokens'] / stats['tagging_time']:.1f} tokens/s per process"
+        )
+
+    return relationships
+
+
+def vectorize(relationships: List[Relationship], config: Config, workers: int) -> TupleStore:
+    """
+    Create the tuples for the relationships, with a pool of 'workers' processes, in the order of the relationships.
+    """
+    print("Building TF-IDF vectors")
+    size = max(1, len(relationships) // (workers * 4))
+    slices = [relationships[i : i + size] for i in range(0, len(relationships), size)]
+    tuples = TupleStore()
+    lookups, hits = 0, 0
+    for chunk_tuples, (chunk_lookups, chunk_hits) in map_chunks(vectorize_chunk, slices, config, workers):
+        tuples.extend(chunk_tuples)
+        lookups += chunk_lookups
+        hits += chunk_hits
+    if lookups:
+        print(f"Contexts cache: {hits} hits in {lookups} lookups ({100 * hits / lookups:.1f}%)")
+    return tuples
+
+
+def generate_tuples(sentences_file: str, config: Config, workers: int = 1) -> TupleStore:
+    """
+    Generate tuples instances from a text file with sentences where named entities are already tagged.
+
+    Each sentence is read and tokenized once: the tokens feed both the dictionary and document frequencies of the
+    vector space model, if 'config.vsm' is not set, and the extraction of the relationships. The relationships are
+    turned into tuples, held in a TupleStore, once the TF-IDF weights are final.
+
+    The file is split into byte-range chunks which are processed by a pool of 'workers' processes, the results of
+    each chunk are merged in the order of the chunks in the file, so the output does not depend on the number of
+    workers.
+    """
+    vsm = VectorSpaceModel() if config.vsm is None else None
+    relationships = ingest(sentences_file, config, vsm, workers)
+    if vsm is not None:
+        vsm.finalize()
+        config.vsm = vsm
+    return vectorize(relationships, config, workers)
+
+
+def append_tuples(
+    sentences_file: str, config: Config, tuples: TupleStore, workers: int = 1, max_idf_drift: float = MAX_IDF_DRIFT
+) -> TupleStore:
+    """
+    Add the tuples of the sentences in a new file to the ones already generated, only the new sentences are tokenized
+    and tagged.
+
+    The dictionary and the document frequencies of the vector space model in 'config.vsm' are updated with the new
+    sentences, and the new tuples are vectorized with the updated TF-IDF weights. The vectors of the tuples already
+    generated are only computed again, from the contexts kept in the store, if the IDF of any term changed by more
+    than 'max_idf_drift', relative to its previous value.
+    """
+    vsm = config.vsm
+    if vsm is None:
+        raise ValueError("appending sentences requires the vector space model of the sentences already processed")
+    idf = vsm.idf()
+    relationships = ingest(sentences_file, config, vsm, workers)
+    vsm.finalize()
+
+    drift = vsm.idf_drift(idf)
+    print(f"IDF drift: {drift:.4f}")
+    if drift > max_idf_drift:
+        print("IDF drift over the tolerance, computing again the TF-IDF vectors of the tuples already generated")
+        existing = [
+            Relationship(
+                tpl.sentence,
+                tpl.bef_words,
+                tpl.bet_words,
+                tpl.aft_words,
+                tpl.ent1,
+                tpl.ent2,
+                config.e1_type,
+                config.e2_type,
+            )
+            for tpl in tuples
+        ]
+        return vectorize(existing + relationships, config, workers)
+
+    tuples.extend(vectorize(relationships, config, workers))
+    return tuples
@@ -1,42 +1,63 @@
 __author__ = "David S. Batista"
 __email__ = "dsbatista@gmail.com"
 
-import sys
-from copy import deepcopy
+from collections import defaultdict
 from math import log
-from typing import Any, List, Optional, Set, Tuple
+from typing import Any, DefaultDict, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
 
 from snowball.config import Config
-from snowball.snowball_tuple import SnowballTuple
+from snowball.tuple_store import TupleStore
+
+CONTEXTS = ("bef", "bet", "aft")
+
+# tolerance for floating point rounding when checking that the tuples TF-IDF weights are normalized
+WEIGHT_TOLERANCE = 1e-9
 
 
 class Pattern:
     # pylint: disable=too-many-instance-attributes
     """
-    A pattern is a set of tuples that is used to extract relationships between named-entities.
+    A pattern is a set of tuples that is used to extract relationships between named-entities, the tuples are
+    referenced by their position in the TupleStore.
     """
 
-    def __init__(self, tpl: Optional[SnowballTuple]) -> None:
+    def __init__(self, store: TupleStore, tpl: Optional[int] = None) -> None:
+        self.store = store
         self.positive: int = 0
         self.negative: int = 0
         self.unknown: int = 0
         self.confidence_old: float = 0.0
         self.confidence: float = 0.0
-        self.tuples: List[SnowballTuple] = []
+        self.tuples: List[int] = []
         self.tuple_patterns: Set[Any] = set()
-        self.centroid_bef: Optional[List[Tuple[int, float]]] = []
-        self.centroid_bet: Optional[List[Tuple[int, float]]] = []
-        self.centroid_aft: Optional[List[Tuple[int, float]]] = []
+        # running sums of the weights of each term in each context, the centroids are computed from these, on demand;
+        # if the first tuple has no vector for a context the sums and the centroid for that context are None
+        self.sums: Dict[str, Optional[Dict[int, float]]] = {ctx: {} for ctx in CONTEXTS}
+        self.centroids: Dict[str, Optional[List[Tuple[int, float]]]] = {}
         if tpl is not None:
-            self.tuples.append(tpl)
-            self.centroid_bef = tpl.bef_vector
-            self.centroid_bet = tpl.bet_vector
-            self.centroid_aft = tpl.aft_vector
+            self.add_tuple(tpl)
+
+    @property
+    def centroid_bef(self) -> Optional[List[Tuple[int, float]]]:
+        """Centroid of the BEF context vectors"""
+        return self.calculate_centroid("bef")
+
+    @property
+    def centroid_bet(self) -> Optional[List[Tuple[int, float]]]:
+        """Centroid of the BET context vectors"""
+        return self.calculate_centroid("bet")
+
+    @property
+    def centroid_aft(self) -> Optional[List[Tuple[int, float]]]:
+        """Centroid of the AFT context vectors"""
+        return self.calculate_centroid("aft")
 
     def __str__(self) -> str:
         output = ""
         for tpl in self.tuples:
-            output += str(tpl) + "|"
+            output += str(self.store[tpl]) + "|"
         return output
 
     def __eq__(self, other: Any) -> bool:
@@ -64,29 +85,51 @@ class Pattern:
         if self.positive > 0 or self.negative > 0:
             self.confidence = float(self.positive) / float(self.positive + self.negative)
 
-    def add_tuple(self, tpl: SnowballTuple) -> None:
+    def add_tuple(self, tpl: int) -> None:
         """
-        Add another tuple to be used to generate the pattern
+        Add another tuple to be used to generate the pattern, updating the running sums of each context in O(k), where
+        k is the number of terms in the tuple vectors.
         """
+        vectors = {ctx: self.store.vector_arrays(tpl, ctx) for ctx in CONTEXTS}
+        for ctx, vector in vectors.items():
+            if vector is not None and not np.all(
+                (-WEIGHT_TOLERANCE <= vector[1]) & (vector[1] <= 1.0 + WEIGHT_TOLERANCE)
+            ):
+                raise ValueError(
+                    f"{ctx} vector of tuple {self.store[tpl]} is not normalized, weights must be in [0, 1]"
+                )
+
+        for ctx, vector in vectors.items():
+            if vector is None:
+                if not self.tuples:
+                    self.sums[ctx] = None
+                continue
+            sums = self.sums[ctx]
+            if sums is not None:
+                for idx, weight in zip(vector[0].tolist(), vector[1].tolist()):
+                    sums[idx] = sums.get(idx, 0.0) + weight
+
         self.tuples.append(tpl)
         self.update_centroid()
 
-    def update_selectivity(self, tpl: SnowballTuple, config: Config) -> None:
+    def update_selectivity(self, tpl: int, config: Config) -> None:
         """
-        Update the selectivity of the pattern
+        Update the selectivity of the pattern, matching the tuple against the seeds with the seeds index
         """
-        for seed in config.positive_seeds:
-            if seed.ent1 == tpl.ent1 or seed.ent1.strip() == tpl.ent1.strip():
-                if seed.ent2 == tpl.ent2.strip() or seed.ent2.strip() == tpl.ent2.strip():
-                    self.positive += 1
-                else:
-                    self.negative += 1
-            else:
-                for neg_seed in config.negative_seeds:
-                    if neg_seed.ent1 == tpl.ent1 or neg_seed.ent1.strip() == tpl.ent1.strip():
-                        if neg_seed.ent2 == tpl.ent2.strip() or neg_seed.ent2.strip() == tpl.ent2.strip():
-                            self.negative += 1
-                self.unknown += 1
+        store = self.store
+        positive, negative, unknown = config.seed_index.classify(
+            store.entities[store.ent1[tpl]], store.entities[store.ent2[tpl]]
+        )
+        self.add_selectivity(positive, negative, unknown, config)
+
+    def add_selectivity(self, positive: int, negative: int, unknown: int, config: Config) -> None:
+        """
+        Add the positive, negative and unknown matches of one or many tuples, the confidence only depends on the totals
+        so adding the counts of many tuples at once is the same as updating the selectivity with each tuple.
+        """
+        self.positive += positive
+        self.negative += negative
+        self.unknown += unknown
 
         # self.update_confidence()
         self.update_confidence_2003(config)
@@ -97,66 +140,105 @@ class Pattern:
         """
         # ToDo: fazer o merge tendo em consideração todos os contextos
         for tpl in self.tuples:
-            self.tuple_patterns.add(tpl.bet_words)
+            self.tuple_patterns.add(tuple(self.store.context(tpl, "bet")))
 
     def update_centroid(self) -> None:
         """
-        Calculate the centroid of a pattern, based on the tuples associated with it.
-
-        If there is just one tuple associated with this pattern, the centroid is the tuple itself. Otherwise,
-        the centroid is the average of all tuples associated with this pattern.
-        """
-        if len(self.tuples) == 1:
-            self.centroid_bef = self.tuples[0].bef_vector
-            self.centroid_bet = self.tuples[0].bet_vector
-            self.centroid_aft = self.tuples[0].aft_vector
-        else:
-            self.centroid_bef = self.calculate_centroid("bef")
-            self.centroid_bet = self.calculate_centroid("bet")
-            self.centroid_aft = self.calculate_centroid("aft")
-
-    def calculate_centroid(self, context: str) -> Any:  # noqa: C901
-        # pylint: disable=too-many-nested-blocks
-        """
-        Calculate the centroid of a pattern
-        """
-        # ToDo: refactor this method
-        centroid = deepcopy(self.tuples[0].get_vector(context))
-        if centroid is not None:
-            # add all other words from other tuples
-            for tpl in range(1, len(self.tuples), 1):
-                current_words = [e[0] for e in centroid]
-                words = self.tuples[tpl].get_vector(context)
-                if words is not None:
-                    for word in words:
-                        # if word already exists in centroid, update its tf-idf
-                        if word[0] in current_words:
-                            # get the current tf-idf for this word in the centroid
-                            for i in range(0, len(centroid), 1):
-                                if centroid[i][0] == word[0]:
-                                    current_tf_idf = centroid[i][1]
-                                    # sum the tf-idf from the tuple to the current tf_idf
-                                    current_tf_idf += word[1]
-                                    # update (w,tf-idf) in the centroid
-                                    w_new = list(centroid[i])
-                                    w_new[1] = current_tf_idf
-                                    centroid[i] = tuple(w_new)  # type: ignore
-                                    break
-                        # if it is not in the centroid, added it with the associated tf-idf score
-                        else:
-                            centroid.append(word)
-
-            # divide tf-idf score of tuple (w,tf-idf), by the number of vectors
-            for i in range(0, len(centroid), 1):
-                tmp = list(centroid[i])
-                tmp[1] /= len(self.tuples)
-                # assure that the tf-idf values are still normalized
-                try:
-                    assert tmp[1] <= 1.0
-                    assert tmp[1] >= 0.0
-                except AssertionError:
-                    print("Error calculating extraction pattern centroid")
-                    sys.exit(0)
-                centroid[i] = tuple(tmp)  # type: ignore
-
-        return centroid
+        Invalidate the centroids of the pattern, they are computed again from the running sums when needed.
+        """
+        self.centroids.clear()
+
+    def calculate_centroid(self, context: str) -> Optional[List[Tuple[int, float]]]:
+        """
+        Calculate the centroid of a pattern for the given context, the average of the vectors of all the tuples
+        associated with this pattern, with the terms in the order they were first seen.
+        """
+        if context not in self.centroids:
+            sums = self.sums[context]
+            if sums is None:
+                self.centroids[context] = None
+            else:
+                self.centroids[context] = [(idx, total / len(self.tuples)) for idx, total in sums.items()]
+        return self.centroids[context]
+
+
+def patterns_to_arrays(patterns: Sequence[Pattern]) -> Dict[str, np.ndarray]:
+    """
+    The state of the patterns as arrays: the positions of the tuples of all the patterns, the offsets of the tuples of
+    each pattern, and the (positive, negative, unknown) counts and (confidence, confidence_old) of each pattern.
+    """
+    return {
+        "tuples": np.array([tpl for pattern in patterns for tpl in pattern.tuples], dtype=np.int64),
+        "offsets": np.cumsum([0] + [len(pattern.tuples) for pattern in patterns], dtype=np.int64),
+        "counts": np.array(
+            [(pattern.positive, pattern.negative, pattern.unknown) for pattern in patterns], dtype=np.int64
+        ).reshape(-1, 3),
+        "confidence": np.array(
+            [(pattern.confidence, pattern.confidence_old) for pattern in patterns], dtype=np.float64
+        ).reshape(-1, 2),
+    }
+
+
+def patterns_from_arrays(store: TupleStore, arrays: Dict[str, np.ndarray]) -> List[Pattern]:
+    """
+    The patterns saved by patterns_to_arrays(), the centroids are computed again from the tuples, added in the same
+    order, giving the same running sums.
+    """
+    patterns = []
+    offsets = arrays["offsets"].tolist()
+    tuples = arrays["tuples"].tolist()
+    for idx, (start, end) in enumerate(zip(offsets, offsets[1:])):
+        pattern = Pattern(store)
+        for tpl in tuples[start:end]:
+            pattern.add_tuple(tpl)
+        pattern.positive, pattern.negative, pattern.unknown = arrays["counts"][idx].tolist()
+        pattern.confidence, pattern.confidence_old = arrays["confidence"][idx].tolist()
+        patterns.append(pattern)
+    return patterns
+
+
+class PatternIndex:
+    """
+    Inverted index from the terms of the patterns centroids, in each of the given contexts, to the patterns, such that
+    a tuple is only compared with the patterns with which it shares a term, the only ones with a similarity above 0.
+
+    The terms of a centroid are the terms of the vectors of all the tuples of the pattern, the index is updated as
+    patterns are created and tuples are added to them.
+    """
+
+    def __init__(self, contexts: Sequence[str]) -> None:
+        self.index: Dict[str, DefaultDict[int, Set[int]]] = {ctx: defaultdict(set) for ctx in contexts}
+
+    def add_pattern(self, pattern_idx: int, pattern: Pattern) -> None:
+        """
+        Index all the terms of the centroids of a pattern.
+        """
+        for ctx, index in self.index.items():
+            sums = pattern.sums[ctx]
+            if sums is not None:
+                for term in sums:
+                    index[term].add(pattern_idx)
+
+    def add_tuple(
+        self, pattern_idx: int, pattern: Pattern, vectors: Dict[str, Optional[List[Tuple[int, float]]]]
+    ) -> None:
+        """
+        Index the terms of the vectors of a tuple just added to a pattern.
+        """
+        for ctx, index in self.index.items():
+            vector = vectors[ctx]
+            if vector and pattern.sums[ctx] is not None:
+                for term, _ in vector:
+                    index[term].add(pattern_idx)
+
+    def candidates(self, vectors: Dict[str, Optional[List[Tuple[int, float]]]]) -> List[int]:
+        """
+        The patterns sharing at least one term with the vectors of a tuple, in ascending order.
+        """
+        found: Set[int] = set()
+        for ctx, index in self.index.items():
+            vector = vectors[ctx]
+            if vector:
+                for term, _ in vector:
+                    found.update(index.get(term, ()))
+        return sorted(found)
@@ -1,12 +1,83 @@
 __author__ = "David S. Batista"
 __email__ = "dsbatista@gmail.com"
 
-import io
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, Sequence, Tuple
+
+# classes of the tags in the ReVerb grammar, as bits, a tag in none of them is 0
+VERB, ADV, PRT, NOUN, ADJ, PRON, DET, ADP = (1 << bit for bit in range(8))
+
+# the PTB tags of each class
+PTB_TAGS = {
+    VERB: ["VB", "VBD", "VBD|VBN", "VBG", "VBG|NN", "VBN", "VBP", "VBP|TO", "VBZ", "VP"],
+    ADV: ["RB", "RBR", "RBS", "RB|RP", "RB|VBG", "WRB"],
+    PRT: ["POS", "PRT", "TO", "RP"],
+    NOUN: ["NN", "NNP", "NNPS", "NNS", "NN|NNS", "NN|SYM", "NN|VBG", "NP"],
+    ADJ: ["JJ", "JJR", "JJRJR", "JJS", "JJ|RB", "JJ|VBG"],
+    PRON: ["WP", "WP$", "PRP", "PRP$", "PRP|VBP"],
+    DET: ["DT", "EX", "PDT", "WDT"],
+    ADP: ["IN", "IN|RP"],
+}
+
+# the reduced tag set (Petrov et al. 2012) http://arxiv.org/pdf/1104.2086.pdf
+UNIVERSAL_TAGS = {
+    VERB: ["VERB"],
+    ADV: ["ADV"],
+    PRT: ["PRT"],
+    NOUN: ["NOUN"],
+    ADJ: ["ADJ"],
+    PRON: ["PRON"],
+    DET: ["DET"],
+    ADP: ["ADP"],
+}
+
+# V | V P | V W*P, a pattern starts with a verb followed by the tokens of each of these classes in turn:
+# V = verb particle? adv? (also capture auxiliary verbs)
+# W = (noun | adj | adv | pron | det)
+# P = (prep | particle | inf. marker)
+STATES = (VERB | ADV | PRT, NOUN | ADJ | ADV | PRON | DET, ADP | PRT)
+
+
+class ReverbMatcher:
+    """
+    The ReVerb grammar compiled for a tag set: each tag is mapped once to the bits of its classes, and the patterns are
+    matched by a state machine over the classes of the tokens.
+    """
+
+    def __init__(self, tags: Dict[int, List[str]]) -> None:
+        self.classes: Dict[str, int] = {}
+        for tag_class, class_tags in tags.items():
+            for tag in class_tags:
+                self.classes[tag] = self.classes.get(tag, 0) | tag_class
+
+    def spans(self, tags: Sequence[str]) -> List[Tuple[int, int]]:
+        """
+        The (start, end) of each pattern in a sequence of tags; the token following a pattern never starts another.
+        """
+        classes = [self.classes.get(tag, 0) for tag in tags]
+        spans = []
+        i = 0
+        while i < len(classes):
+            # a ReVerb pattern always starts with a verb
+            if classes[i] & VERB:
+                start = i
+                i += 1
+                for state in STATES:
+                    while i < len(classes) and classes[i] & state:
+                        i += 1
+                spans.append((start, i))
+            i += 1
+        return spans
+
+    def match(self, tagged_text: Sequence[Tuple[Any, Any]]) -> List[Tuple[Any, Any]]:
+        """
+        The tokens of all the patterns in a tagged text, merged into a single relation phrase.
+        """
+        spans = self.spans([tag for _, tag in tagged_text])
+        return [(token, tag) for start, end in spans for token, tag in tagged_text[start:end]]
+
 
-from nltk import pos_tag, word_tokenize
-from nltk.stem.wordnet import WordNetLemmatizer
-from nltk.tag.mapping import map_tag
+PTB_MATCHER = ReverbMatcher(PTB_TAGS)
+UNIVERSAL_MATCHER = ReverbMatcher(UNIVERSAL_TAGS)
 
 
 class Reverb:
@@ -19,8 +90,13 @@ class Reverb:
     """
 
     def __init__(self) -> None:
+        # NLTK is only imported once it is needed, it is slow to import
+        from nltk.stem.wordnet import WordNetLemmatizer  # noqa: PLC0415
+
         self.lmtzr = WordNetLemmatizer()
         self.aux_verbs = ["be"]
+        # the verbs already lemmatized, most tuples share a few auxiliary and common verbs
+        self.lemmas: Dict[str, str] = {}
 
     @staticmethod
     def extract_reverb_patterns(text: str) -> Tuple[List[str], List[List[Tuple[Any, Any]]]]:
@@ -48,6 +124,9 @@ class Reverb:
         # P = (prep | particle | inf. marker)
         """
 
+        from nltk import pos_tag, word_tokenize  # noqa: PLC0415
+        from nltk.tag.mapping import map_tag  # noqa: PLC0415
+
         # split text into tokens
         text_tokens = word_tokenize(text)
 
@@ -56,57 +135,17 @@ class Reverb:
         tags_ptb = pos_tag(text_tokens)
 
         # convert the tags to reduced tag set (Petrov et al. 2012) http://arxiv.org/pdf/1104.2086.pdf
-        tags = []
-        for tmp_tag in tags_ptb:
-            tag = map_tag("en-ptb", "universal", tmp_tag[1])
-            tags.append((tmp_tag[0], tag))
+        tags = [(token, map_tag("en-ptb", "universal", tag)) for token, tag in tags_ptb]
 
         patterns = []
         patterns_tags = []
-        i = 0
-        limit = len(tags) - 1
-
-        while i <= limit:
-            tmp = io.StringIO()
-            tmp_tags = []
-
-            # a ReVerb pattern always starts with a verb
-            if tags[i][1] == "VERB":
-                tmp.write(tags[i][0] + " ")
-                tmp_tag = (tags[i][0], tags[i][1])
-                tmp_tags.append(tmp_tag)
-                i += 1
-
-                # V = verb particle? adv? (also capture auxiliary verbs)
-                while i <= limit and tags[i][1] in ["VERB", "PRT", "ADV"]:
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # W = (noun | adj | adv | pron | det)
-                while i <= limit and tags[i][1] in ["NOUN", "ADJ", "ADV", "PRON", "DET"]:
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # P = (prep | particle | inf. marker)
-                while i <= limit and tags[i][1] in ["ADP", "PRT"]:
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-                # add the build pattern to the list collected patterns
-                patterns.append(tmp.getvalue())
-                patterns_tags.append(tmp_tags)
-            i += 1
-
+        for start, end in UNIVERSAL_MATCHER.spans([tag for _, tag in tags]):
+            patterns.append("".join(token + " " for token, _ in tags[start:end]))
+            patterns_tags.append(tags[start:end])
         return patterns, patterns_tags
 
     @staticmethod
     def extract_reverb_patterns_tagged_ptb(tagged_text: List[Tuple[Any, Any]]) -> List[Tuple[Any, Any]]:
-        # pylint: disable=too-many-locals
         """
         Extract ReVerb relational patterns
         http://homes.cs.washington.edu/~afader/bib_pdf/emnlp11.pdf
@@ -120,165 +159,35 @@ class Reverb:
         V = verb particle? adv?
         W = (noun | adj | adv | pron | det)
         P = (prep | particle | inf. marker)
-        """
-
-        patterns = []
-        patterns_tags = []
-        i = 0
-        limit = len(tagged_text) - 1
-        tags = tagged_text
-
-        verb = ["VB", "VBD", "VBD|VBN", "VBG", "VBG|NN", "VBN", "VBP", "VBP|TO", "VBZ", "VP"]
-        adverb = ["RB", "RBR", "RBS", "RB|RP", "RB|VBG", "WRB"]
-        particule = ["POS", "PRT", "TO", "RP"]
-        noun = ["NN", "NNP", "NNPS", "NNS", "NN|NNS", "NN|SYM", "NN|VBG", "NP"]
-        adjective = ["JJ", "JJR", "JJRJR", "JJS", "JJ|RB", "JJ|VBG"]
-        pronoun = ["WP", "WP$", "PRP", "PRP$", "PRP|VBP"]
-        determiner = ["DT", "EX", "PDT", "WDT"]
-        adp = ["IN", "IN|RP"]
 
+        If the pattern matches multiple adjacent sequences they are merged into a single relation phrase, e.g.: "wants
+        to extend", enabling the model to readily handle relation phrases containing multiple verbs.
+        """
         # TODO: detect negations
         # ('rejected', 'VBD'), ('a', 'DT'), ('takeover', 'NN')
-
-        while i <= limit:
-            tmp = io.StringIO()
-            tmp_tags = []
-
-            # a ReVerb pattern always starts with a verb
-            if tags[i][1] in verb:
-                tmp.write(tags[i][0] + " ")
-                tmp_tag = (tags[i][0], tags[i][1])
-                tmp_tags.append(tmp_tag)
-                i += 1
-
-                # V = verb particle? adv? (also capture auxiliary verbs)
-                while i <= limit and (tags[i][1] in verb or tags[i][1] in adverb or tags[i][1] in particule):
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # W = (noun | adj | adv | pron | det)
-                while i <= limit and (
-                    tags[i][1] in noun
-                    or tags[i][1] in adjective
-                    or tags[i][1] in adverb
-                    or tags[i][1] in pronoun
-                    or tags[i][1] in determiner
-                ):
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # P = (prep | particle | inf. marker)
-                while i <= limit and (tags[i][1] in adp or tags[i][1] in particule):
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # add the build pattern to the list collected patterns
-                patterns.append(tmp.getvalue())
-                patterns_tags.append(tmp_tags)
-            i += 1
-
-        # if the pattern matches multiple adjacent sequences merge them into a single relation phrase, e.g.:
-        # "wants to extend", enabling the model to readily handle relation phrases containing multiple verbs.
-        merged_patterns_tags = [item for sublist in patterns_tags for item in sublist]
-        return merged_patterns_tags
+        return PTB_MATCHER.match(tagged_text)
 
     @staticmethod
-    def extract_reverb_patterns_ptb(text: str) -> List[Tuple[Any, Any]]:  # pylint: disable=too-many-locals
+    def extract_reverb_patterns_ptb(text: str) -> List[Tuple[Any, Any]]:
         """
         Extract ReVerb relational patterns from raw text.
 
         Part-of-speech tagging is performed using the default NTLK English tagger.
         """
-
-        # The pattern limits the relation to be a verb (e.g., invented),
-        # a verb followed immediately by a preposition (e.g., located in),
-        # or a verb followed by nouns, adjectives, or adverbs ending in a
-        # preposition (e.g., has an atomic weight of).
-
-        # V | V P | V W*P
-        # V = verb particle? adv?
-        # W = (noun | adj | adv | pron | det)
-        # P = (prep | particle | inf. marker)
+        from nltk import pos_tag, word_tokenize  # noqa: PLC0415
 
         # split text into tokens
         text_tokens = word_tokenize(text)
 
         # tag the sentence, using the default NTLK English tagger
         # POS_TAGGER = 'taggers/maxent_treebank_pos_tagger/english.pickle'
-        tags_ptb = pos_tag(text_tokens)
-        patterns = []
-        patterns_tags = []
-        i = 0
-        limit = len(tags_ptb) - 1
-        tags = tags_ptb
-
-        verb = ["VB", "VBD", "VBD|VBN", "VBG", "VBG|NN", "VBN", "VBP", "VBP|TO", "VBZ", "VP"]
-        adverb = ["RB", "RBR", "RBS", "RB|RP", "RB|VBG", "WRB"]
-        particule = ["POS", "PRT", "TO", "RP"]
-        noun = ["NN", "NNP", "NNPS", "NNS", "NN|NNS", "NN|SYM", "NN|VBG", "NP"]
-        adjectiv = ["JJ", "JJR", "JJRJR", "JJS", "JJ|RB", "JJ|VBG"]
-        pronoun = ["WP", "WP$", "PRP", "PRP$", "PRP|VBP"]
-        determiner = ["DT", "EX", "PDT", "WDT"]
-        adp = ["IN", "IN|RP"]
-
-        # match is chosen.
-
-        while i <= limit:
-            tmp = io.StringIO()
-            tmp_tags = []
-
-            # a ReVerb pattern always starts with a verb
-            if tags[i][1] in verb:
-                tmp.write(tags[i][0] + " ")
-                tmp_tag = (tags[i][0], tags[i][1])
-                tmp_tags.append(tmp_tag)
-                i += 1
-
-                # V = verb particle? adv? (also capture auxiliary verbs)
-                while i <= limit and (tags[i][1] in verb or tags[i][1] in adverb or tags[i][1] in particule):
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # W = (noun | adj | adv | pron | det)
-                while i <= limit and (
-                    tags[i][1] in noun
-                    or tags[i][1] in adjectiv
-                    or tags[i][1] in adverb
-                    or tags[i][1] in pronoun
-                    or tags[i][1] in determiner
-                ):
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # P = (prep | particle | inf. marker)
-                while i <= limit and (tags[i][1] in adp or tags[i][1] in particule):
-                    tmp.write(tags[i][0] + " ")
-                    tmp_tag = (tags[i][0], tags[i][1])
-                    tmp_tags.append(tmp_tag)
-                    i += 1
-
-                # add the build pattern to the list collected patterns
-                patterns.append(tmp.getvalue())
-                patterns_tags.append(tmp_tags)
-            i += 1
-
-        # Finally, if the pattern matches multiple adjacent sequences, we merge
-        # them into a single relation phrase (e.g.,wants to extend).
-        # This refinement enables the model to readily handle relation
-        # phrases containing multiple verbs.
+        return PTB_MATCHER.match(pos_tag(text_tokens))
 
-        merged_patterns_tags = [item for sublist in patterns_tags for item in sublist]
-        return merged_patterns_tags
+    def lemmatize_verb(self, word: str) -> str:
+        """Lemmatize a verb, memoized"""
+        if (lemma := self.lemmas.get(word)) is None:
+            lemma = self.lemmas[word] = self.lmtzr.lemmatize(word, "v")
+        return lemma
 
     def detect_passive_voice(self, pattern: List[Tuple[Any, Any]]) -> bool:
         """Detect if the passive voice is present in a pattern"""
@@ -293,7 +202,7 @@ class Reverb:
 
         if len(pattern) >= min_pattern_length:
             if pattern[0][1].startswith("V"):
-                verb = self.lmtzr.lemmatize(pattern[0][0], "v")
+                verb = self.lemmatize_verb(pattern[0][0])
                 if verb in self.aux_verbs:
                     if (pattern[1][1] == "VBN" or pattern[1][1] == "VBD") and pattern[-1][0] == "by":
                         passive_voice = True
@@ -1,7 +1,8 @@
 __author__ = "David S. Batista"
 __email__ = "dsbatista@gmail.com"
 
-from typing import Any
+from collections import Counter, defaultdict
+from typing import Any, DefaultDict, Iterable, Tuple
 
 
 class Seed:
@@ -13,8 +14,57 @@ class Seed:
         return hash(self.ent1) ^ hash(self.ent2) ^ hash((self.ent1, self.ent2))
 
     def __eq__(self, other: Any) -> bool:
-        print(other)
-
         if not isinstance(other, Seed):
             return NotImplemented
         return self.ent1 == other.ent1 and self.ent2 == other.ent2
+
+
+class SeedIndex:
+    """
+    Index of the positive and negative seeds by their entities, stripped of surrounding whitespace, such that the
+    selectivity of a pattern for a tuple is updated in constant time, instead of looping over all the seeds.
+
+    Each 'ent1' is mapped to the number of seeds for each 'ent2', seeds which only differ in surrounding whitespace
+    are different seeds but have the same entry, keeping the counts the same as comparing with each seed.
+    """
+
+    def __init__(self, positive_seeds: Iterable[Seed], negative_seeds: Iterable[Seed]) -> None:
+        self.n_positive = 0
+        self.positive: DefaultDict[str, Counter[str]] = defaultdict(Counter)
+        self.positive_ent1: Counter[str] = Counter()
+        self.negative: DefaultDict[str, Counter[str]] = defaultdict(Counter)
+        for seed in positive_seeds:
+            self.add_positive(seed)
+        for seed in negative_seeds:
+            self.add_negative(seed)
+
+    def add_positive(self, seed: Seed) -> None:
+        """
+        Add a positive seed, which must not be in the index already.
+        """
+        self.positive[seed.ent1.strip()][seed.ent2.strip()] += 1
+        self.positive_ent1[seed.ent1.strip()] += 1
+        self.n_positive += 1
+
+    def add_negative(self, seed: Seed) -> None:
+        """
+        Add a negative seed, which must not be in the index already.
+        """
+        self.negative[seed.ent1.strip()][seed.ent2.strip()] += 1
+
+    def classify(self, ent1: str, ent2: str) -> Tuple[int, int, int]:
+        """
+        Number of positive, negative and unknown matches of a pair of entities against the seeds.
+
+        Each positive seed with the same 'ent1' is a positive match if 'ent2' is also the same or a negative match
+        otherwise; each other positive seed is an unknown match, and a negative match for each negative seed with the
+        same pair of entities.
+        """
+        ent1, ent2 = ent1.strip(), ent2.strip()
+        positive = self.positive.get(ent1)
+        same_ent1 = self.positive_ent1[ent1]
+        same_pair = positive.get(ent2, 0) if positive else 0
+        unknown = self.n_positive - same_ent1
+        negative = self.negative.get(ent1)
+        negative_pair = negative.get(ent2, 0) if negative else 0
+        return same_pair, same_ent1 - same_pair + unknown * negative_pair, unknown
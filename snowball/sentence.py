@@ -2,36 +2,105 @@ __author__ = "David S. Batista"
 __email__ = "dsbatista@gmail.com"
 
 import re
-from typing import Any, Dict, List, Set, Tuple
-
-from nltk import word_tokenize
-from nltk.corpus import stopwords
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
 
 # tokens between entities which do not represent relationships
 bad_tokens = [",", "(", ")", ";", "''", "``", "'s", "-", "vs.", "v", "'", ":", ".", "--"]
-stopwords = stopwords.words("english")
-not_valid = bad_tokens + stopwords
 regex_clean_tags = re.compile("</?[A-Z]+>", re.U)
+regex_entity_tags = re.compile("<([A-Z]+)>([^<]+)</[A-Z]+>", re.U)
 
+# maximum number of entity strings whose tokens are kept in memory, the same entities occur in many sentences
+ENTITY_CACHE_SIZE = 2**16
 
-def tokenize_entity(entity: str) -> List[str]:
-    """Simple poor man's tokenization of an entity string"""
+
+# NLTK is only imported, and its resources loaded, once a sentence is processed, it is slow to import
+def word_tokenize(text: str) -> List[str]:
+    """Split a text into tokens, with NLTK's word_tokenize()"""
+    from nltk import word_tokenize as nltk_word_tokenize  # noqa: PLC0415
+
+    return nltk_word_tokenize(text)
+
+
+@lru_cache(maxsize=None)
+def not_valid() -> FrozenSet[str]:
+    """The tokens which alone between two entities do not represent a relationship: the bad tokens and stopwords"""
+    from nltk.corpus import stopwords  # noqa: PLC0415
+
+    return frozenset(bad_tokens + stopwords.words("english"))
+
+
+def occurrences(text: str, string: str) -> List[int]:
+    """Start offsets of all the occurrences of a string in a text."""
+    starts = []
+    start = text.find(string)
+    while start != -1:
+        starts.append(start)
+        start = text.find(string, start + 1)
+    return starts
+
+
+def may_have_relationship(sentence: str, e1_type: str, e2_type: str, max_tokens: int) -> bool:
+    """
+    Cheap check, on the raw sentence and before any tokenization, of whether it can have a relationship: it must have
+    entities of both types, with different strings, and an occurrence of the second after one of the first, with some
+    text between them but at most 'max_tokens' away. Each run of non-whitespace characters is at least one token, so
+    the check does not reject sentences with relationships.
+    """
+    entities = regex_entity_tags.findall(sentence)
+    ents1 = {" ".join(string.split()) for ent_type, string in entities if ent_type == e1_type}
+    ents2 = {" ".join(string.split()) for ent_type, string in entities if ent_type == e2_type}
+    pairs = [(ent1, ent2) for ent1 in ents1 for ent2 in ents2 if ent1 != ent2]
+    if not pairs:
+        return False
+
+    # the entities are also found where their strings occur without tags, see find_locations()
+    text = " ".join(re.sub(regex_clean_tags, "", sentence).split())
+    starts = {string: occurrences(text, string) for string in ents1 | ents2}
+    for ent1, ent2 in pairs:
+        for start1 in starts[ent1]:
+            end1 = start1 + len(ent1)
+            for start2 in starts[ent2]:
+                if start2 >= end1 and 1 <= len(text[end1:start2].split()) < max_tokens:
+                    return True
+    return False
+
+
+@lru_cache(maxsize=ENTITY_CACHE_SIZE)
+def _tokenize_entity(entity: str) -> Tuple[str, ...]:
     parts = word_tokenize(entity)
     if parts[-1] == ".":
         replace = parts[-2] + parts[-1]
         del parts[-1]
         del parts[-1]
         parts.append(replace)
-    return parts
+    return tuple(parts)
+
+
+def tokenize_entity(entity: str) -> List[str]:
+    """Simple poor man's tokenization of an entity string, the tokens of each entity string are cached"""
+    return list(_tokenize_entity(entity))
+
+
+def token_positions(text_tokens: List[str]) -> Dict[str, List[int]]:
+    """Index of the positions of each token in a text."""
+    positions: Dict[str, List[int]] = {}
+    for idx, token in enumerate(text_tokens):
+        positions.setdefault(token, []).append(idx)
+    return positions
 
 
-def find_locations(entity_string: str, text_tokens: List[str]) -> Tuple[List[str], List[int]]:
-    """Find the locations of an entity in a text."""
-    locations = []
+def find_locations(
+    entity_string: str, text_tokens: List[str], positions: Optional[Dict[str, List[int]]] = None
+) -> Tuple[List[str], List[int]]:
+    """
+    Find the locations of an entity in a text, i.e.: wherever its tokens occur, tagged as an entity or not. Only the
+    positions of the first token of the entity are checked, from the index 'positions' of the text if given.
+    """
     ent_parts = tokenize_entity(entity_string)
-    for idx in range(len(text_tokens)):
-        if text_tokens[idx : idx + len(ent_parts)] == ent_parts:
-            locations.append(idx)
+    if positions is None:
+        positions = token_positions(text_tokens)
+    locations = [idx for idx in positions.get(ent_parts[0], []) if text_tokens[idx : idx + len(ent_parts)] == ent_parts]
     return ent_parts, locations
 
 
@@ -94,7 +163,13 @@ class Relationship:  # pylint: disable=too-many-arguments, too-many-instance-att
 
 
 class Sentence:  # pylint: disable=too-few-public-methods, too-many-locals, too-many-arguments
-    """Holds information about a sentence extracted from a document."""
+    """
+    Holds information about a sentence extracted from a document.
+
+    The relationships need the PoS-tags of the sentence, if no 'pos_tagger' is given the pairs of entities which form
+    a relationship are kept in 'pairs', and the relationships are only created once the tagged text is given to
+    add_tagged_text(), such that the sentences can be tagged in batches.
+    """
 
     def __init__(
         self,
@@ -106,32 +181,38 @@ class Sentence:  # pylint: disable=too-few-public-methods, too-many-locals, too-
         window_size: int,
         pos_tagger: Any = None,
     ):  # noqa: C901
-        self.relationships = []
-        self.tagged_text = None
-        self.entities_regex = re.compile("<[A-Z]+>[^<]+</[A-Z]+>", re.U)
-        entities = list(re.finditer(self.entities_regex, sentence))
+        self.sentence = sentence
+        self.e1_type = e1_type
+        self.window_size = window_size
+        self.relationships: List[Relationship] = []
+        self.pairs: List[Tuple[Entity, Entity, int, int]] = []
+        self.tagged_text: Optional[List[Tuple[str, str]]] = None
+        entities = regex_entity_tags.findall(sentence)
+
+        # the sentence is always tokenized, since the tokens are also used to build the vector space model
+        sentence_no_tags = re.sub(regex_clean_tags, "", sentence)  # clean tags from text
+        self.text_tokens = word_tokenize(sentence_no_tags)
+
+        # extract information about the entity, create an Entity instance
+        # and store in a structure to hold information collected about
+        # all the entities in the sentence, the locations of each entity
+        # string are looked up in an index of the tokens of the sentence
+        self.entities: Set[Entity] = set()
+        positions = token_positions(self.text_tokens)
+        found: Dict[str, Tuple[List[str], List[int]]] = {}
+        for e_type, e_string in entities:
+            if e_string not in found:
+                found[e_string] = find_locations(e_string, self.text_tokens, positions)
+            e_parts, ent_locations = found[e_string]
+            self.entities.add(Entity(e_string, e_parts, e_type, ent_locations))
 
         min_entities = 2
         if len(entities) >= min_entities:
-            sentence_no_tags = re.sub(regex_clean_tags, "", sentence)  # clean tags from text
-            text_tokens = word_tokenize(sentence_no_tags)
-
-            # extract information about the entity, create an Entity instance
-            # and store in a structure to hold information collected about
-            # all the entities in the sentence
-            entities_info: Set[Entity] = set()
-            for ent in entities:
-                entity = ent.group()
-                e_string = re.findall("<[A-Z]+>([^<]+)</[A-Z]+>", entity)[0]
-                e_type = re.findall("<([A-Z]+)", entity)[0]
-                e_parts, ent_locations = find_locations(e_string, text_tokens)
-                entities_info.add(Entity(e_string, e_parts, e_type, ent_locations))
-
             # create a hash table:
             #   key: is the starting index in the tokenized sentence of an entity
             #   value: the corresponding Entity instance
             locations: Dict[int, Entity] = {
-                start: entity_obj for entity_obj in entities_info for start in entity_obj.locations
+                start: entity_obj for entity_obj in self.entities for start in entity_obj.locations
             }
 
             # look for a pair of entities such that:
@@ -150,22 +231,36 @@ class Sentence:  # pylint: disable=too-few-public-methods, too-many-locals, too-
                     if ent1.string == ent2.string:
                         continue
 
-                    # run PoS-tagger over the sentence only once
-                    if self.tagged_text is None:
-                        # split text into tokens and tag them using NLTK's default English tagger
-                        # POS_TAGGER = 'taggers/maxent_treebank_pos_tagger/
-                        # english.pickle'
-                        self.tagged_text = pos_tagger.tag(text_tokens)
-
-                    before = self.tagged_text[: sorted_keys[i]]
-                    before = before[-window_size:]
-                    between = self.tagged_text[sorted_keys[i] + len(ent1.parts) : sorted_keys[i + 1]]
-                    after = self.tagged_text[sorted_keys[i + 1] + len(ent2.parts) :]
-                    after = after[:window_size]
-
                     # ignore relationships where BET context is only stopwords or other invalid words
-                    if all(x in not_valid for x in text_tokens[sorted_keys[i] + len(ent1.parts) : sorted_keys[i + 1]]):
+                    if all(
+                        x in not_valid()
+                        for x in self.text_tokens[sorted_keys[i] + len(ent1.parts) : sorted_keys[i + 1]]
+                    ):
                         continue
 
-                    rel = Relationship(sentence, before, between, after, ent1.string, ent2.string, e1_type, ent2.type)
-                    self.relationships.append(rel)
+                    self.pairs.append((ent1, ent2, sorted_keys[i], sorted_keys[i + 1]))
+
+        # run PoS-tagger over the sentence only once, and only if it has relationships
+        if self.pairs and pos_tagger is not None:
+            # split text into tokens and tag them using NLTK's default English tagger
+            # POS_TAGGER = 'taggers/maxent_treebank_pos_tagger/english.pickle'
+            self.add_tagged_text(pos_tagger.tag(self.text_tokens))
+
+    def add_tagged_text(self, tagged_text: List[Tuple[str, str]]) -> None:
+        """Create the relationships of the pairs of entities from the PoS-tagged tokens of the sentence."""
+        self.tagged_text = tagged_text
+        for ent1, ent2, start1, start2 in self.pairs:
+            before = tagged_text[:start1]
+            before = before[-self.window_size :]
+            between = tagged_text[start1 + len(ent1.parts) : start2]
+            after = tagged_text[start2 + len(ent2.parts) :]
+            after = after[: self.window_size]
+            rel = Relationship(self.sentence, before, between, after, ent1.string, ent2.string, self.e1_type, ent2.type)
+            self.relationships.append(rel)
+
+    def context_tokens(self) -> List[str]:
+        """Return the tokens of the sentence which are not part of any entity."""
+        entities_positions = {
+            pos for ent in self.entities for start in ent.locations for pos in range(start, start + len(ent.parts))
+        }
+        return [token for idx, token in enumerate(self.text_tokens) if idx not in entities_positions]
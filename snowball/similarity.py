@@ -0,0 +1,194 @@
+__author__ = "David S. Batista"
+__email__ = "dsbatista@gmail.com"
+
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from snowball.tuple_store import TupleStore
+
+CONTEXTS = ("bef", "bet", "aft")
+
+# maximum number of (tuple, pattern) scores held in memory at once
+BLOCK_SCORES = 2**22
+
+# margin for floating point rounding when comparing the upper bounds of the similarity with the threshold
+BOUND_TOLERANCE = 1e-9
+
+# scores this close to the threshold are computed again pair by pair, see SimilarityEngine.rescore_ties()
+TIE_TOLERANCE = 1e-9
+
+
+def to_csr(vectors: Sequence[Optional[List[Tuple[int, float]]]], n_features: int) -> Any:
+    """
+    Stack sparse vectors, lists of (id, weight), into an L2-normalized CSR matrix, 'None' vectors are empty rows.
+    """
+    indptr = [0]
+    indices: List[int] = []
+    data: List[float] = []
+    for vector in vectors:
+        if vector:
+            for idx, weight in vector:
+                indices.append(idx)
+                data.append(weight)
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+        shape=(len(vectors), n_features),
+    )
+    return normalize_rows(matrix)
+
+
+def store_to_csr(store: TupleStore, context: str, n_features: int) -> Any:
+    """
+    The L2-normalized CSR matrix of the vectors of a context of all the tuples in a TupleStore, built directly from
+    the store arrays, which are already in the CSR layout.
+    """
+    matrix = sparse.csr_matrix(
+        (store.vector_weights[context], store.vector_ids[context], store.vector_offsets[context]),
+        shape=(len(store), n_features),
+    )
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix: Any) -> Any:
+    """
+    Divide each row of a CSR matrix by its L2 norm, rows with no weights are left unchanged.
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+def n_features_of(vectors: Sequence[Optional[List[Tuple[int, float]]]]) -> int:
+    """
+    Return the number of features needed to hold all the vectors, i.e.: the highest id + 1.
+    """
+    return max((idx for vector in vectors if vector for idx, _ in vector), default=-1) + 1
+
+
+def cosine(vec1: List[Tuple[int, float]], vec2: List[Tuple[int, float]]) -> float:
+    """
+    Cosine similarity of two sparse vectors, lists of (id, weight), with the same floating point operations, in the
+    same order, as gensim's cossim(), such that both give the same score.
+    """
+    dict1, dict2 = dict(vec1), dict(vec2)
+    if not dict1 or not dict2:
+        return 0.0
+    len1 = 1.0 * math.sqrt(sum(val * val for val in dict1.values()))
+    len2 = 1.0 * math.sqrt(sum(val * val for val in dict2.values()))
+    if len1 == 0.0 or len2 == 0.0:
+        return 0.0
+    # iterate over the shorter vector
+    if len(dict2) < len(dict1):
+        dict1, dict2 = dict2, dict1
+    result = sum(value * dict2.get(idx, 0.0) for idx, value in dict1.items())
+    result /= len1 * len2
+    return result
+
+
+def pair_similarity(
+    vectors: Sequence[Optional[List[Tuple[int, float]]]],
+    centroids: Sequence[Optional[List[Tuple[int, float]]]],
+    weights: Sequence[float],
+) -> float:
+    """
+    The similarity of a tuple with a pattern, given the BEF, BET and AFT vectors of the tuple, the centroids of the
+    pattern and the alpha, beta and gamma weights: the weighted sum of the cosine of each context, a context missing
+    from either of them adds nothing.
+    """
+    score = 0.0
+    for vector, centroid, weight in zip(vectors, centroids, weights):
+        score += weight * (cosine(vector, centroid) if vector is not None and centroid is not None else 0.0)
+    return score
+
+
+class SimilarityEngine:
+    """
+    Computes the similarity between tuples and extraction patterns in blocks, with sparse matrix products.
+
+    The BEF, BET and AFT vectors of the tuples and the centroids of the patterns are held as L2-normalized sparse
+    matrices, with the alpha, beta and gamma weights folded into the tuples matrices, such that the similarity of a
+    block of tuples with all the patterns is the sum of one sparse matrix product per context. The scores are the
+    same as the ones computed by Snowball.similarity() up to floating point rounding, which may put a score on the other
+    side of the threshold, e.g.: a tuple with the same BET vector as a pattern scores exactly beta, and with beta equal
+    to the threshold the pairwise score is sometimes one bit above it; the scores within TIE_TOLERANCE of the threshold
+    are then computed again pair by pair, see rescore_ties().
+
+    Each tuple also has an upper bound of its similarity with any of the patterns: the cosine of a tuple vector with an
+    L2-normalized centroid is at most the norm of the part of the vector in the terms of the centroids, by the
+    Cauchy-Schwarz inequality, summed over the contexts with a positive weight; the tuples whose bound is below the
+    similarity threshold can be skipped without computing their scores, see candidates().
+    """
+
+    def __init__(self, tuples: TupleStore, alpha: float, beta: float, gamma: float) -> None:
+        self.weights = dict(zip(CONTEXTS, (alpha, beta, gamma)))
+        self.tuples = tuples
+        self.n_tuples = len(tuples)
+        self.tuples_matrices: Dict[str, Any] = {}
+        self.n_features = max(int(tuples.vector_ids[ctx].max(initial=-1)) + 1 for ctx in CONTEXTS)
+        for ctx, weight in self.weights.items():
+            if weight != 0:
+                self.tuples_matrices[ctx] = weight * store_to_csr(tuples, ctx, self.n_features)
+        self.patterns_matrices: Dict[str, Any] = {}
+        self.centroids: List[List[Optional[List[Tuple[int, float]]]]] = []
+        self.n_patterns = 0
+        self.bounds = np.zeros(self.n_tuples, dtype=np.float64)
+
+    def set_patterns(self, patterns: Sequence[Any]) -> None:
+        """
+        Build the centroids matrices for the given patterns, replacing the previous ones.
+        """
+        self.n_patterns = len(patterns)
+        self.centroids = [[getattr(pattern, "centroid_" + ctx) for ctx in CONTEXTS] for pattern in patterns]
+        centroids = {ctx: [getattr(pattern, "centroid_" + ctx) for pattern in patterns] for ctx in self.tuples_matrices}
+        n_features = max([self.n_features] + [n_features_of(vectors) for vectors in centroids.values()])
+        if n_features > self.n_features:
+            self.n_features = n_features
+            for matrix in self.tuples_matrices.values():
+                matrix.resize((self.n_tuples, self.n_features))
+        # transposed once here, such that each block of scores is a product of two CSR matrices
+        self.patterns_matrices = {ctx: to_csr(vectors, self.n_features).T.tocsr() for ctx, vectors in centroids.items()}
+
+        # the alpha, beta and gamma weights are already folded into the tuples matrices, a context with a negative
+        # weight only lowers the similarity and does not add to the bound
+        self.bounds = np.zeros(self.n_tuples, dtype=np.float64)
+        for ctx, matrix in self.tuples_matrices.items():
+            if self.weights[ctx] > 0:
+                # the terms in any of the centroids, i.e.: the rows with weights in the transposed centroids matrix
+                in_centroids = (np.diff(self.patterns_matrices[ctx].indptr) > 0).astype(np.float64)
+                self.bounds += np.sqrt(matrix.multiply(matrix) @ in_centroids)
+
+    def block_size(self) -> int:
+        """
+        Number of tuples to score at once, such that a block of scores does not exceed BLOCK_SCORES.
+        """
+        return max(1, BLOCK_SCORES // max(1, self.n_patterns))
+
+    def candidates(self, start: int, end: int, threshold: float) -> np.ndarray:
+        """
+        Positions of the tuples in [start, end) whose similarity with some pattern can reach 'threshold'.
+        """
+        return start + np.flatnonzero(self.bounds[start:end] >= threshold - BOUND_TOLERANCE)
+
+    def scores_of(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Similarity of the tuples at the given positions with each pattern, as a dense len(positions) x n_patterns array.
+        """
+        scores = np.zeros((len(positions), self.n_patterns), dtype=np.float64)
+        for ctx, matrix in self.tuples_matrices.items():
+            scores += (matrix[positions] @ self.patterns_matrices[ctx]).toarray()
+        return scores
+
+    def rescore_ties(self, positions: np.ndarray, scores: np.ndarray, threshold: float) -> None:
+        """
+        Compute again, with pair_similarity(), the scores of the tuples at the given positions within TIE_TOLERANCE of
+        'threshold', such that they are on the same side of it as the ones of Snowball.similarity().
+        """
+        weights = [self.weights[ctx] for ctx in CONTEXTS]
+        rows, columns = np.nonzero(np.abs(scores - threshold) <= TIE_TOLERANCE)
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            vectors = [self.tuples.vector(int(positions[row]), ctx) for ctx in CONTEXTS]
+            scores[row, column] = pair_similarity(vectors, self.centroids[column], weights)
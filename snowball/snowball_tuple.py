@@ -1,143 +1,232 @@
 __author__ = "David S. Batista"
 __email__ = "dsbatista@gmail.com"
 
-from typing import Any, Dict, List, Optional, Tuple
+import json
+from functools import lru_cache
+from hashlib import blake2b
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from snowball.reverb_breds import Reverb
 
+if TYPE_CHECKING:
+    from snowball.tuple_store import TupleStore
 
-class SnowballTuple:
-    # pylint: disable=too-many-instance-attributes, too-many-arguments
+# see: http://www.ling.upenn.edu/courses/Fall_2007/ling001/penn_treebank_pos.html
+# select everything except stopwords, ADJ and ADV
+FILTER_POS = ["JJ", "JJR", "JJS", "RB", "RBR", "RBS", "WRB"]
+
+# maximum number of contexts, of each kind, whose terms are kept in a ContextDocumentCache
+CONTEXT_CACHE_SIZE = 2**16
+
+
+def fingerprint(
+    ent1: str, ent2: str, before: List[Tuple[str, str]], between: List[Tuple[str, str]], after: List[Tuple[str, str]]
+) -> int:
+    """
+    A 128-bit digest of the entities and the three contexts of a tuple, unlike hash() on strings it is the same across
+    processes and runs.
+    """
+    content = json.dumps([ent1, ent2, before, between, after], ensure_ascii=False)
+    return int.from_bytes(blake2b(content.encode("utf8"), digest_size=16).digest(), "big")
+
+
+def text_document(text: List[Tuple[str, str]], config: Any) -> List[str]:
+    """
+    The terms of a context, this is only applies when ReVerb is not used to extract patterns.
+    """
+    words, _ = zip(*text)
+    return [word.lower() for word in words if word not in config.stopwords]
+
+
+def pattern_document(pattern_tags: List[Tuple[str, str]], config: Any) -> List[str]:
+    """
+    The terms of a ReVerb pattern.
+    """
+    return [t[0] for t in pattern_tags if t[0].lower() not in config.stopwords and t[1] not in FILTER_POS]
+
+
+def words_document(words: List[Tuple[str, str]], config: Any) -> List[str]:
+    """
+    The terms of a context, filtering stopwords, ADJ and ADV.
+    """
+    tokens, tags = zip(*words)
+    return [
+        token for token, tag in zip(tokens, tags) if token.lower() not in config.stopwords and tag not in FILTER_POS
+    ]
+
+
+def bet_document(between: List[Tuple[str, str]], config: Any) -> Tuple[List[str], Optional[bool]]:
+    """
+    The terms of the BET context of a tuple, and whether the BET context is in the passive voice.
+
+    If a ReVerb pattern is found in the BET context the terms are the words part of the pattern, otherwise all words
+    filtering stopwords, ADJ and ADV.
+    """
+    passive_voice = None
+    patterns_bet_tags = Reverb.extract_reverb_patterns_tagged_ptb(between)
+    if patterns_bet_tags:
+        passive_voice = config.reverb.detect_passive_voice(patterns_bet_tags)
+        # 's_ is always wrongly tagged as VBZ, if the first word is 's' ignore it
+        if patterns_bet_tags[0][0] == "'s":
+            document = words_document(between, config)
+        else:
+            document = pattern_document(patterns_bet_tags, config)
+    else:
+        document = words_document(between, config)
+    return document, passive_voice
+
+
+class ContextDocumentCache:
+    """
+    Bounded LRU caches of the terms of the contexts, keyed on the (word, tag) pairs of a context, since the same short
+    contexts, e.g.: "based in", repeat across many tuples; the terms of equal contexts are the same objects. The terms
+    of many contexts are then turned into TF-IDF vectors at once, see VectorSpaceModel.vectorize().
     """
-    Tuple class:
 
-    see: http://www.ling.upenn.edu/courses/Fall_2007/ling001/penn_treebank_pos.html
-    select everything except stopwords, ADJ and ADV
+    def __init__(self, config: Any, maxsize: int = CONTEXT_CACHE_SIZE) -> None:
+        self.config = config
+        self.words_document = lru_cache(maxsize)(self._words_document)
+        self.bet_document = lru_cache(maxsize)(self._bet_document)
+
+    def _words_document(self, words: Tuple[Tuple[str, str], ...]) -> Optional[Tuple[str, ...]]:
+        if self.config.use_reverb == "no":
+            return tuple(text_document(list(words), self.config)) if words else ()
+        return tuple(words_document(list(words), self.config)) if words else None
+
+    def _bet_document(self, between: Tuple[Tuple[str, str], ...]) -> Tuple[Tuple[str, ...], Optional[bool]]:
+        if self.config.use_reverb == "no":
+            return tuple(text_document(list(between), self.config)) if between else (), None
+        document, passive_voice = bet_document(list(between), self.config)
+        return tuple(document), passive_voice
+
+    def context_documents(
+        self, before: List[Tuple[str, str]], between: List[Tuple[str, str]], after: List[Tuple[str, str]]
+    ) -> Tuple[Tuple[Optional[Tuple[str, ...]], ...], Optional[bool]]:
+        """
+        The terms of the BEF, BET and AFT contexts of a tuple, None if a context has no vector, and whether the BET
+        context is in the passive voice, see bet_document(), taken from the caches. Without ReVerb the terms of all the
+        contexts are the words of the context without stopwords, with ReVerb the BEF and AFT terms are the words of the
+        context filtering stopwords, ADJ and ADV.
+        """
+        document, passive_voice = self.bet_document(tuple(between))
+        return (self.words_document(tuple(before)), document, self.words_document(tuple(after))), passive_voice
+
+    def stats(self) -> Tuple[int, int]:
+        """
+        The number of lookups and of hits of the caches.
+        """
+        infos = [self.words_document.cache_info(), self.bet_document.cache_info()]
+        return sum(info.hits + info.misses for info in infos), sum(info.hits for info in infos)
+
+
+class SnowballTuple:
+    """
+    Tuple class: a view over the tuple at position 'idx' of a TupleStore, the entities, the sentence, the BEF, BET
+    and AFT contexts and their TF-IDF vectors are read from the store arrays, the confidence is written to them.
 
     # construct TF-IDF vectors with the words part of a ReVerb pattern
     # or if no ReVerb patterns with selected words from the contexts
 
     """
 
-    filter_pos = ["JJ", "JJR", "JJS", "RB", "RBR", "RBS", "WRB"]
-
-    def __init__(
-        self,
-        ent1: str,
-        ent2: str,
-        sentence: str,
-        before: List[Tuple[str, str]],
-        between: List[Tuple[str, str]],
-        after: List[Tuple[str, str]],
-        config: Any,
-    ) -> None:
-        self.ent1 = ent1
-        self.ent2 = ent2
-        self.sentence = sentence
-        self.confidence: float = 0.0
-        self.confidence_old: float = 0.0
-        self.bef_words = before
-        self.bet_words = between
-        self.aft_words = after
-        self.config = config
-        self.bef_vector = None
-        self.bet_vector = None
-        self.aft_vector = None
-        self.bef_reverb_vector = None
-        self.bet_reverb_vector = None
-        self.aft_reverb_vector = None
-        self.passive_voice = None
-        if config.use_reverb == "no":
-            self.bef_vector = self.create_vector(self.bef_words) if self.bef_words else []
-            self.bet_vector = self.create_vector(self.bet_words) if self.bet_words else []
-            self.aft_vector = self.create_vector(self.aft_words) if self.aft_words else []
-        else:
-            self.extract_patterns()
+    __slots__ = ("store", "idx")
+
+    def __init__(self, store: "TupleStore", idx: int) -> None:
+        self.store = store
+        self.idx = idx
+
+    @property
+    def ent1(self) -> str:
+        """The first entity"""
+        return self.store.entities[self.store.ent1[self.idx]]
+
+    @property
+    def ent2(self) -> str:
+        """The second entity"""
+        return self.store.entities[self.store.ent2[self.idx]]
+
+    @property
+    def sentence(self) -> str:
+        """The sentence where the tuple occurs"""
+        return self.store.sentences[self.store.sentence[self.idx]]
+
+    @property
+    def bef_words(self) -> List[Tuple[str, str]]:
+        """The (word, tag) pairs before the first entity"""
+        return self.store.context(self.idx, "bef")
+
+    @property
+    def bet_words(self) -> List[Tuple[str, str]]:
+        """The (word, tag) pairs between the entities"""
+        return self.store.context(self.idx, "bet")
+
+    @property
+    def aft_words(self) -> List[Tuple[str, str]]:
+        """The (word, tag) pairs after the second entity"""
+        return self.store.context(self.idx, "aft")
+
+    @property
+    def bef_vector(self) -> Optional[List[Tuple[int, float]]]:
+        """TF-IDF vector of the BEF context"""
+        return self.store.vector(self.idx, "bef")
+
+    @property
+    def bet_vector(self) -> Optional[List[Tuple[int, float]]]:
+        """TF-IDF vector of the BET context"""
+        return self.store.vector(self.idx, "bet")
+
+    @property
+    def aft_vector(self) -> Optional[List[Tuple[int, float]]]:
+        """TF-IDF vector of the AFT context"""
+        return self.store.vector(self.idx, "aft")
+
+    @property
+    def passive_voice(self) -> Optional[bool]:
+        """If the ReVerb pattern in the BET context is in the passive voice, None if there is no such pattern"""
+        flag = self.store.passive_voice[self.idx]
+        return None if flag < 0 else bool(flag)
+
+    @property
+    def fingerprint(self) -> int:
+        """Digest of the entities and the contexts, see fingerprint()"""
+        high, low = self.store.fingerprint[self.idx].tolist()
+        return int(high) << 64 | int(low)
+
+    @property
+    def confidence(self) -> float:
+        """Confidence of the tuple"""
+        return float(self.store.confidence[self.idx])
+
+    @confidence.setter
+    def confidence(self, value: float) -> None:
+        self.store.confidence[self.idx] = value
+
+    @property
+    def confidence_old(self) -> float:
+        """Confidence of the tuple in the previous iteration"""
+        return float(self.store.confidence_old[self.idx])
+
+    @confidence_old.setter
+    def confidence_old(self, value: float) -> None:
+        self.store.confidence_old[self.idx] = value
 
     def __str__(self) -> str:
         return f"{self.bef_words}  {self.bet_words}  {self.aft_words}"
 
     def __eq__(self, other: object) -> bool:
+        # tuples are equal if they have the same entities and contexts, compared through the fingerprint
         if not isinstance(other, SnowballTuple):
             return False
-        return (
-            self.ent1 == other.ent1
-            and self.ent2 == other.ent2
-            and self.bef_words == other.bef_words
-            and self.bet_words == other.bet_words
-            and self.aft_words == other.aft_words
-        )
+        return self.fingerprint == other.fingerprint
 
     def __hash__(self) -> int:
-        return hash(self.ent1) ^ hash(self.ent2)
+        return hash(self.fingerprint)
 
     def get_vector(self, context: str) -> Optional[List[Tuple[int, float]]]:
         """
         Return the vector for the given context
         """
-        if context == "bef":
-            return self.bef_vector
-        if context == "bet":
-            return self.bet_vector
-        # ToDo: can only be "aft" here
-        return self.aft_vector
-
-    def create_vector(self, text: List[Tuple[str, str]]) -> List[Tuple[int, float]]:
-        """
-        Create a TF-IDF vector for the given text, this is only applies when ReVerb is not used to extract patterns.
-        """
-        words, _ = zip(*text)
-        tokens = [word.lower() for word in words if word not in self.config.stopwords]
-        vect_ids = self.config.vsm.dictionary.doc2bow(tokens)
-        return self.config.vsm.tf_idf_model[vect_ids]
-
-    def construct_pattern_vector(self, pattern_tags: List[Tuple[str, str]]) -> List[Tuple[int, float]]:
-        """
-        Construct TF-IDF representation for each context
-        """
-        pattern = [
-            t[0] for t in pattern_tags if t[0].lower() not in self.config.stopwords and t[1] not in self.filter_pos
-        ]
-        vect_ids = self.config.vsm.dictionary.doc2bow(pattern)
-        return self.config.vsm.tf_idf_model[vect_ids]
-
-    def construct_words_vectors(self, words: List[Tuple[str, str]]) -> List[Tuple[int, float]]:
-        """
-        Construct TF-IDF representation for each context
-        """
-        tokens, tags = zip(*words)
-        pattern = [
-            token
-            for token, tag in zip(tokens, tags)
-            if token.lower() not in self.config.stopwords and tag not in self.filter_pos
-        ]
-        vect_ids = self.config.vsm.dictionary.doc2bow(pattern)
-        return self.config.vsm.tf_idf_model[vect_ids]
-
-    def extract_patterns(self) -> None:
-        """
-        If a ReVerb pattern is found in the BET context it constructs a TF-IDF vector with the words part of the
-        pattern, otherwise uses all words filtering stopwords, ADJ and ADV.
-
-        For the BEF and AFT contexts it uses all words filtering stopwords, ADJ and ADV.
-        """
-
-        if patterns_bet_tags := Reverb.extract_reverb_patterns_tagged_ptb(self.bet_words):
-            self.passive_voice = self.config.reverb.detect_passive_voice(patterns_bet_tags)
-            # 's_ is always wrongly tagged as VBZ, if the first word is 's' ignore it
-            if patterns_bet_tags[0][0] == "'s":
-                self.bet_vector = self.construct_words_vectors(self.bet_words)
-            else:
-                self.bet_vector = self.construct_pattern_vector(patterns_bet_tags)
-        else:
-            self.bet_vector = self.construct_words_vectors(self.bet_words)
-
-        # extract two words before the first entity, and two words after the second entity
-        if len(self.bef_words) > 0:
-            self.bef_vector = self.construct_words_vectors(self.bef_words)
-
-        if len(self.aft_words) > 0:
-            self.aft_vector = self.construct_words_vectors(self.aft_words)
+        return self.store.vector(self.idx, context)
 
     def to_json(self) -> Dict[str, Any]:
         """
@@ -0,0 +1,366 @@
+__author__ = "David S. Batista"
+__email__ = "dsbatista@gmail.com"
+
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from snowball.snowball_tuple import SnowballTuple, fingerprint
+
+CONTEXTS = ("bef", "bet", "aft")
+
+# passive voice flags, None means no ReVerb pattern was found in the BET context
+PASSIVE_VOICE = {None: -1, False: 0, True: 1}
+
+# version of the on-disk format written by TupleStore.save(), bumped on any incompatible change
+FORMAT_VERSION = 1
+FORMAT_FILE = "format.json"
+
+# the arrays saved to disk, one .npy file each, the per-context ones are saved as '<name>.<context>.npy'
+COLUMNS = ("ent1", "ent2", "sentence", "passive_voice", "fingerprint", "token_offsets", "token_words", "token_tags")
+CONTEXT_COLUMNS = ("vector_offsets", "vector_ids", "vector_weights", "vector_none")
+VOCABULARIES = ("entities", "sentences", "words", "tags")
+
+
+class Vocabulary:
+    """
+    Maps strings to integer ids, in the order they were first added.
+
+    A vocabulary loaded from disk keeps the strings encoded in one array of bytes, with the offsets of each string, and
+    only decodes them when they are read; the list of strings and the mapping to ids are built on the first lookup.
+    """
+
+    def __init__(self) -> None:
+        self.loaded_strings: List[str] = []
+        self.loaded_ids: Dict[str, int] = {}
+        self.data: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_arrays(cls, data: np.ndarray, offsets: np.ndarray) -> "Vocabulary":
+        """
+        A vocabulary over the strings encoded in 'data', the string 'i' is in data[offsets[i] : offsets[i + 1]].
+        """
+        vocabulary = cls()
+        vocabulary.data, vocabulary.offsets = data, offsets
+        return vocabulary
+
+    @property
+    def strings(self) -> List[str]:
+        """All the strings, in the order of their ids"""
+        self.decode()
+        return self.loaded_strings
+
+    @property
+    def ids(self) -> Dict[str, int]:
+        """The id of each string"""
+        self.decode()
+        return self.loaded_ids
+
+    def decode(self) -> None:
+        """
+        Decode all the strings of a vocabulary loaded from disk.
+        """
+        if self.data is not None:
+            self.loaded_strings = [self[idx] for idx in range(len(self))]
+            self.loaded_ids = {string: idx for idx, string in enumerate(self.loaded_strings)}
+            self.data = self.offsets = None
+
+    def __len__(self) -> int:
+        if self.offsets is not None:
+            return len(self.offsets) - 1
+        return len(self.loaded_strings)
+
+    def __getitem__(self, idx: int) -> str:
+        if self.data is not None and self.offsets is not None:
+            return bytes(self.data[self.offsets[idx] : self.offsets[idx + 1]]).decode("utf8")
+        return self.loaded_strings[idx]
+
+    def add(self, string: str) -> int:
+        """
+        Return the id of a string, adding it to the vocabulary if not seen before.
+        """
+        idx = self.ids.get(string)
+        if idx is None:
+            idx = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return idx
+
+    def get(self, string: str) -> Optional[int]:
+        """
+        Return the id of a string, or None if not in the vocabulary.
+        """
+        return self.ids.get(string)
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The strings encoded in one array of bytes, and the offsets of each string.
+        """
+        if self.data is not None and self.offsets is not None:
+            return self.data, self.offsets
+        encoded = [string.encode("utf8") for string in self.loaded_strings]
+        offsets = np.concatenate(([0], np.cumsum([len(string) for string in encoded], dtype=np.int64)))
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class TupleStore:
+    # pylint: disable=too-many-instance-attributes
+    """
+    Holds all the tuples as a struct of arrays: the entities, sentences, context words and tags are ids into
+    vocabularies, the tokens of the BEF, BET and AFT contexts of each tuple are contiguous slices of one array, and the
+    TF-IDF vectors of each context are stored in the CSR layout, i.e.: offsets, term ids and weights arrays.
+
+    A SnowballTuple is a view over one position of the store. Tuples are added with add() and turned into arrays in
+    batches by flush(), which is called by len(), indexing and iteration; the arrays must not be read directly while
+    there are pending tuples.
+    """
+
+    def __init__(self) -> None:
+        self.entities = Vocabulary()
+        self.sentences = Vocabulary()
+        self.words = Vocabulary()
+        self.tags = Vocabulary()
+        self.ent1 = np.empty(0, dtype=np.int32)
+        self.ent2 = np.empty(0, dtype=np.int32)
+        self.sentence = np.empty(0, dtype=np.int32)
+        self.passive_voice = np.empty(0, dtype=np.int8)
+        self.fingerprint = np.empty((0, 2), dtype=np.uint64)
+        self.confidence = np.empty(0, dtype=np.float64)
+        self.confidence_old = np.empty(0, dtype=np.float64)
+        # the words of the context 'c' (0: BEF, 1: BET, 2: AFT) of the tuple 'i' are the slice of 'token_words' between
+        # token_offsets[3 * i + c] and token_offsets[3 * i + c + 1]
+        self.token_offsets = np.zeros(1, dtype=np.int64)
+        self.token_words = np.empty(0, dtype=np.int32)
+        self.token_tags = np.empty(0, dtype=np.int32)
+        # a vector is None, if the tuple has no such context, or a possibly empty list of (term id, weight)
+        self.vector_offsets = {ctx: np.zeros(1, dtype=np.int64) for ctx in CONTEXTS}
+        self.vector_ids = {ctx: np.empty(0, dtype=np.int32) for ctx in CONTEXTS}
+        self.vector_weights = {ctx: np.empty(0, dtype=np.float64) for ctx in CONTEXTS}
+        self.vector_none = {ctx: np.empty(0, dtype=bool) for ctx in CONTEXTS}
+        # tuples added but not yet turned into arrays, see flush()
+        self.pending: List[Tuple[Any, ...]] = []
+
+    def __len__(self) -> int:
+        self.flush()
+        return len(self.ent1)
+
+    def __getitem__(self, idx: int) -> SnowballTuple:
+        self.flush()
+        if not 0 <= idx < len(self.ent1):
+            raise IndexError(f"tuple index {idx} out of range")
+        return SnowballTuple(self, idx)
+
+    def __iter__(self) -> Iterator[SnowballTuple]:
+        self.flush()
+        for idx in range(len(self.ent1)):
+            yield SnowballTuple(self, idx)
+
+    def add(  # noqa: PLR0913
+        self,
+        ent1: str,
+        ent2: str,
+        sentence: str,
+        contexts: Tuple[List[Tuple[str, str]], List[Tuple[str, str]], List[Tuple[str, str]]],
+        vectors: Tuple[Optional[List[Tuple[int, float]]], ...],
+        passive_voice: Optional[bool],
+    ) -> None:
+        # pylint: disable=too-many-arguments
+        """
+        Add a tuple, given its entities, sentence, BEF, BET and AFT contexts as lists of (word, tag), and the vectors of
+        each context.
+        """
+        digest = fingerprint(ent1, ent2, *contexts)
+        self.pending.append(
+            (
+                self.entities.add(ent1),
+                self.entities.add(ent2),
+                self.sentences.add(sentence),
+                (digest >> 64, digest & 0xFFFFFFFFFFFFFFFF),
+                PASSIVE_VOICE[passive_voice],
+                [[(self.words.add(word), self.tags.add(tag)) for word, tag in context] for context in contexts],
+                vectors,
+            )
+        )
+
+    def flush(self) -> None:
+        """
+        Turn the pending tuples into arrays, appended to the ones of the tuples already in the store.
+        """
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        chunk = TupleStore()
+        chunk.ent1 = np.array([row[0] for row in pending], dtype=np.int32)
+        chunk.ent2 = np.array([row[1] for row in pending], dtype=np.int32)
+        chunk.sentence = np.array([row[2] for row in pending], dtype=np.int32)
+        chunk.fingerprint = np.array([row[3] for row in pending], dtype=np.uint64).reshape(-1, 2)
+        chunk.passive_voice = np.array([row[4] for row in pending], dtype=np.int8)
+        chunk.confidence = np.zeros(len(pending), dtype=np.float64)
+        chunk.confidence_old = np.zeros(len(pending), dtype=np.float64)
+
+        tokens = [token for row in pending for context in row[5] for token in context]
+        lengths = [len(context) for row in pending for context in row[5]]
+        chunk.token_offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        chunk.token_words = np.array([word for word, _ in tokens], dtype=np.int32)
+        chunk.token_tags = np.array([tag for _, tag in tokens], dtype=np.int32)
+
+        for pos, ctx in enumerate(CONTEXTS):
+            vectors = [row[6][pos] for row in pending]
+            terms = [term for vector in vectors if vector for term in vector]
+            lengths = [len(vector) if vector else 0 for vector in vectors]
+            chunk.vector_offsets[ctx] = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+            chunk.vector_ids[ctx] = np.array([idx for idx, _ in terms], dtype=np.int32)
+            chunk.vector_weights[ctx] = np.array([weight for _, weight in terms], dtype=np.float64)
+            chunk.vector_none[ctx] = np.array([vector is None for vector in vectors], dtype=bool)
+
+        self.append_arrays(chunk)
+
+    def set_vectors(self, context: str, vectors: Any, none: np.ndarray) -> None:
+        """
+        Set the vectors of a context of all the tuples in the store, from a CSR matrix with a row per tuple, e.g.: built
+        by VectorSpaceModel.vectorize(), and a mask of the tuples without such context, whose rows are empty.
+        """
+        self.flush()
+        if vectors.shape[0] != len(self.ent1) or len(none) != len(self.ent1):
+            raise ValueError(f"{vectors.shape[0]} vectors given for the {len(self.ent1)} tuples in the store")
+        self.vector_offsets[context] = vectors.indptr.astype(np.int64)
+        self.vector_ids[context] = vectors.indices.astype(np.int32)
+        self.vector_weights[context] = vectors.data.astype(np.float64)
+        self.vector_none[context] = np.asarray(none, dtype=bool)
+
+    def extend(self, other: "TupleStore") -> None:
+        """
+        Append all the tuples of another store, e.g.: built by a worker process from a chunk of the sentences.
+        """
+        self.flush()
+        other.flush()
+        mappings = [
+            np.array([vocabulary.add(string) for string in other_vocabulary.strings], dtype=np.int32)
+            for vocabulary, other_vocabulary in (
+                (self.entities, other.entities),
+                (self.sentences, other.sentences),
+                (self.words, other.words),
+                (self.tags, other.tags),
+            )
+        ]
+        self.append_arrays(other, mappings)
+
+    def append_arrays(self, other: "TupleStore", mappings: Optional[Sequence[np.ndarray]] = None) -> None:
+        """
+        Append the arrays of another store, translating the ids of its entities, sentences, words and tags to the ids
+        in this store vocabularies with the given mappings, if any.
+        """
+        entities, sentences, words, tags = mappings if mappings is not None else (None, None, None, None)
+
+        def remap(ids: np.ndarray, mapping: Optional[np.ndarray]) -> np.ndarray:
+            return ids if mapping is None else mapping[ids]
+
+        self.ent1 = np.concatenate((self.ent1, remap(other.ent1, entities)))
+        self.ent2 = np.concatenate((self.ent2, remap(other.ent2, entities)))
+        self.sentence = np.concatenate((self.sentence, remap(other.sentence, sentences)))
+        self.fingerprint = np.concatenate((self.fingerprint, other.fingerprint))
+        self.passive_voice = np.concatenate((self.passive_voice, other.passive_voice))
+        self.confidence = np.concatenate((self.confidence, other.confidence))
+        self.confidence_old = np.concatenate((self.confidence_old, other.confidence_old))
+        self.token_offsets = np.concatenate((self.token_offsets, other.token_offsets[1:] + self.token_offsets[-1]))
+        self.token_words = np.concatenate((self.token_words, remap(other.token_words, words)))
+        self.token_tags = np.concatenate((self.token_tags, remap(other.token_tags, tags)))
+        for ctx in CONTEXTS:
+            offsets = self.vector_offsets[ctx]
+            self.vector_offsets[ctx] = np.concatenate((offsets, other.vector_offsets[ctx][1:] + offsets[-1]))
+            self.vector_ids[ctx] = np.concatenate((self.vector_ids[ctx], other.vector_ids[ctx]))
+            self.vector_weights[ctx] = np.concatenate((self.vector_weights[ctx], other.vector_weights[ctx]))
+            self.vector_none[ctx] = np.concatenate((self.vector_none[ctx], other.vector_none[ctx]))
+
+    def context(self, idx: int, context: str) -> List[Tuple[str, str]]:
+        """
+        The (word, tag) pairs of a context of a tuple.
+        """
+        pos = 3 * idx + CONTEXTS.index(context)
+        start, end = self.token_offsets[pos], self.token_offsets[pos + 1]
+        return [
+            (self.words[word], self.tags[tag])
+            for word, tag in zip(self.token_words[start:end].tolist(), self.token_tags[start:end].tolist())
+        ]
+
+    def vector_arrays(self, idx: int, context: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        The term ids and weights of the vector of a context of a tuple, or None if the tuple has no such vector.
+        """
+        if self.vector_none[context][idx]:
+            return None
+        start, end = self.vector_offsets[context][idx], self.vector_offsets[context][idx + 1]
+        return self.vector_ids[context][start:end], self.vector_weights[context][start:end]
+
+    def vector(self, idx: int, context: str) -> Optional[List[Tuple[int, float]]]:
+        """
+        The vector of a context of a tuple, as a list of (term id, weight), or None if the tuple has no such vector.
+        """
+        arrays = self.vector_arrays(idx, context)
+        if arrays is None:
+            return None
+        return list(zip(arrays[0].tolist(), arrays[1].tolist()))
+
+    def save(self, path: str) -> None:
+        """
+        Save the store to the directory 'path', as one .npy file per array, replacing any previous one at once, such
+        that an interrupted save never leaves a partial store behind.
+        """
+        self.flush()
+        tmp_path = path.rstrip(os.sep) + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in COLUMNS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        for name in CONTEXT_COLUMNS:
+            for ctx in CONTEXTS:
+                np.save(os.path.join(tmp_path, f"{name}.{ctx}.npy"), getattr(self, name)[ctx])
+        for name in VOCABULARIES:
+            data, offsets = getattr(self, name).to_arrays()
+            np.save(os.path.join(tmp_path, f"{name}.data.npy"), data)
+            np.save(os.path.join(tmp_path, f"{name}.offsets.npy"), offsets)
+        with open(os.path.join(tmp_path, FORMAT_FILE), "wt", encoding="utf8") as f_out:
+            json.dump({"version": FORMAT_VERSION, "tuples": len(self.ent1)}, f_out)
+        if os.path.exists(path):
+            old_path = path.rstrip(os.sep) + ".old"
+            # left behind by a save interrupted before it was removed, renaming onto it would fail
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.rename(path, old_path)
+            os.rename(tmp_path, path)
+            shutil.rmtree(old_path)
+        else:
+            os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TupleStore":
+        """
+        Open a store saved with save(). The arrays are memory-mapped, so only the parts which are read are loaded from
+        disk, e.g.: matching the seeds only reads the entities ids and strings. The confidences are not saved, they
+        start at 0 in a loaded store.
+        """
+        format_file = os.path.join(path, FORMAT_FILE)
+        if not os.path.exists(format_file):
+            raise ValueError(f"{path} is not a directory of processed tuples")
+        with open(format_file, encoding="utf8") as f_in:
+            version = json.load(f_in)["version"]
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has processed tuples in format {version}, expected {FORMAT_VERSION}, regenerate it"
+            )
+
+        def column(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        store = cls()
+        for name in COLUMNS:
+            setattr(store, name, column(name))
+        for name in CONTEXT_COLUMNS:
+            setattr(store, name, {ctx: column(f"{name}.{ctx}") for ctx in CONTEXTS})
+        for name in VOCABULARIES:
+            setattr(store, name, Vocabulary.from_arrays(column(f"{name}.data"), column(f"{name}.offsets")))
+        store.confidence = np.zeros(len(store.ent1), dtype=np.float64)
+        store.confidence_old = np.zeros(len(store.ent1), dtype=np.float64)
+        return store
@@ -1,37 +1,153 @@
 __author__ = "David S. Batista"
 __email__ = "dsbatista@gmail.com"
 
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
 
-from gensim import corpora
-from gensim.models import TfidfModel
-from nltk import word_tokenize
-from tqdm import tqdm
+import numpy as np
 
-from snowball.commons import blocks, clean_tags
+# terms with an IDF, or a normalized weight, not above it are left out of the TF-IDF vectors, as in gensim's TfidfModel
+EPS = 1e-12
+
+# since Python 3.12 sum() adds floats with Neumaier's compensated summation, gensim's norms are rounded accordingly
+COMPENSATED_SUM = sys.version_info >= (3, 12)
 
 
 class VectorSpaceModel:  # pragma: no cover
-    # pylint: disable=too-few-public-methods
     """
     Vector Space Model class
-    # remove stop words and tokenize
+
+    The model is built incrementally from the tokenized sentences, no documents nor bag-of-words corpus are kept in
+    memory, only the dictionary and the TF-IDF model, which is all that is needed to vectorize the relationships
+    contexts.
+
+    The contexts are vectorized in batches by vectorize(), straight from the 'token2id' map and the 'idfs' array, with
+    the weights of gensim's TfidfModel, i.e.: the term frequency times the IDF, log2(documents / document frequency),
+    normalized to unit length, up to floating point rounding.
     """
 
-    def __init__(self, sentences_file: str, stopwords: set) -> None:
-        self.dictionary = None
-        self.corpus = None
+    # the IDF of each term id, set by finalize(), or once needed by models pickled before it was kept
+    idfs: Optional[np.ndarray] = None
+
+    def __init__(self) -> None:
+        # gensim is only imported when a model is built, or unpickled, it is slow to import
+        from gensim import corpora  # noqa: PLC0415
 
-        with open(sentences_file, "r", encoding="utf8") as f_in:
-            total = sum(bl.count("\n") for bl in blocks(f_in))
+        self.dictionary = corpora.Dictionary()
+        self.tf_idf_model = None
 
-        with open(sentences_file, "rt", encoding="utf8") as f_sentences:
-            documents = []
-            for sentence in tqdm(f_sentences, total=total):
-                sentence_clean = clean_tags(sentence)
-                document = [word for word in word_tokenize(sentence_clean.lower()) if word not in stopwords]
-                documents.append(document)
+    @staticmethod
+    def document(tokens: List[str], stopwords: Set[str]) -> List[str]:
+        """
+        Turn the tokens of a sentence into a document: lower-cased and without stopwords.
+        """
+        return [word for word in (token.lower() for token in tokens) if word not in stopwords]
 
-        self.dictionary = corpora.Dictionary(documents)
-        self.corpus = [self.dictionary.doc2bow(text) for text in documents]
-        self.tf_idf_model = TfidfModel(self.corpus)
+    def add_documents(self, documents: Iterable[List[str]]) -> None:
+        """
+        Update the dictionary and the documents frequencies with a batch of documents.
+        """
+        self.dictionary.add_documents(documents)
+
+    def finalize(self) -> None:
+        """
+        Compute the TF-IDF weights, after all the documents were added.
+        """
+        # the dictionary already holds the document frequencies of each token, the TF-IDF model is built from it
+        # without another pass over the corpus
+        from gensim.models import TfidfModel  # noqa: PLC0415
+
+        self.tf_idf_model = TfidfModel(dictionary=self.dictionary)
+        self.idfs = self.idf()
         print(f"{len(self.dictionary)} unique tokens")
+
+    @property
+    def token2id(self) -> Dict[str, int]:
+        """
+        The id of each term of the dictionary.
+        """
+        return self.dictionary.token2id
+
+    def vectorize(self, documents: Sequence[Sequence[str]]) -> Any:
+        """
+        The TF-IDF vectors of a batch of documents, as a SciPy CSR matrix with a row per document, each row with the
+        terms of the dictionary in the document, sorted by term id, and their weights, as gensim's TfidfModel computes
+        them for the bag-of-words of the document; tokens not in the dictionary are ignored.
+        """
+        from scipy import sparse  # noqa: PLC0415
+
+        if self.idfs is None:
+            self.idfs = self.idf()
+        n_docs, n_terms = len(documents), len(self.idfs)
+        lengths = np.fromiter((len(document) for document in documents), dtype=np.int64, count=n_docs)
+        token2id = self.token2id
+        ids = np.fromiter(
+            (token2id.get(token, -1) for document in documents for token in document),
+            dtype=np.int64,
+            count=int(lengths.sum()),
+        )
+        rows = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+        known = ids >= 0
+
+        # the frequency of each term in each document, sorted by document and term id
+        keys, counts = np.unique(rows[known] * n_terms + ids[known], return_counts=True)
+        rows, ids = np.divmod(keys, n_terms)
+        idfs = self.idfs[ids]
+        keep = np.abs(idfs) > EPS
+        rows, ids, weights = rows[keep], ids[keep], counts[keep] * idfs[keep]
+
+        weights = weights / np.sqrt(self.squared_norms(rows, weights, n_docs))[rows]
+        keep = np.abs(weights) > EPS
+        rows, ids, weights = rows[keep], ids[keep], weights[keep]
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n_docs), dtype=np.int64)))
+        return sparse.csr_matrix((weights, ids.astype(np.int32), indptr), shape=(n_docs, n_terms))
+
+    @staticmethod
+    def squared_norms(rows: np.ndarray, weights: np.ndarray, n_docs: int) -> np.ndarray:
+        """
+        The sum of the squared weights of each document, given sorted by document, added one term at a time in the
+        order of the term ids, for all the documents at once, so that the sums are rounded as the ones of sum() in
+        gensim are, with the compensation of the running interpreter's sum(), see COMPENSATED_SUM.
+        """
+        norms = np.zeros(n_docs, dtype=np.float64)
+        compensation = np.zeros(n_docs, dtype=np.float64)
+        # gensim squares each weight with pow(), which does not always round as weight * weight does
+        squares = np.float_power(weights, 2)
+        lengths = np.bincount(rows, minlength=n_docs)
+        ends = np.cumsum(lengths)
+        position = ends - lengths
+        active = np.flatnonzero(position < ends)
+        while len(active) > 0:
+            square, norm = squares[position[active]], norms[active]
+            if COMPENSATED_SUM:
+                total = norm + square
+                compensation[active] += np.where(
+                    np.abs(norm) >= np.abs(square), (norm - total) + square, (square - total) + norm
+                )
+                norms[active] = total
+            else:
+                norms[active] = norm + square
+            position[active] += 1
+            active = active[position[active] < ends[active]]
+        return norms + compensation
+
+    def idf(self) -> np.ndarray:
+        """
+        The IDF of each term of the dictionary, indexed by the term id.
+        """
+        idf = np.zeros(len(self.dictionary), dtype=np.float64)
+        if self.tf_idf_model is not None:
+            for idx, value in self.tf_idf_model.idfs.items():
+                idf[idx] = value
+        return idf
+
+    def idf_drift(self, previous: np.ndarray) -> float:
+        """
+        The largest change of the IDF of a term since 'previous' was taken, relative to the previous IDF; new terms
+        are not considered, since no vector built before has them.
+        """
+        current = self.idf()[: len(previous)]
+        change = np.abs(current - previous)
+        relative = np.divide(change, previous, out=np.full_like(change, np.inf), where=previous > 0)
+        relative[change == 0] = 0.0
+        return float(relative.max(initial=0.0))
@@ -0,0 +1,76 @@
+import os
+import random
+
+import pytest
+
+from snowball.bootstrapping import Snowball
+from snowball.tuple_store import TupleStore
+
+CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, "parameters.cfg")
+ORGS = ["SAP", "Nokia", "Bayer", "Lufthansa", "Google", "Siemens"]
+LOCS = ["Walldorf", "Espoo", "Leverkusen", "Cologne", "Mountain View", "Munich"]
+# the BET contexts, and the ids of their terms in the vectors
+BET = [("based in", [1, 2]), ("headquartered in", [3, 2]), ("opened a plant in", [4, 5, 2])]
+
+
+@pytest.fixture
+def tuples(tmp_path):
+    rng = random.Random(5)
+    store = TupleStore()
+    for _ in range(120):
+        words, ids = rng.choice(BET)
+        weights = [rng.uniform(0.5, 1.0) for _ in ids]
+        norm = sum(weight**2 for weight in weights) ** 0.5
+        vectors = ([(rng.randrange(6, 9), 1.0)], [(idx, weight / norm) for idx, weight in zip(ids, weights)], None)
+        bet = [(word, "NN") for word in words.split()]
+        store.add(rng.choice(ORGS), rng.choice(LOCS), "sentence", ([], bet, []), vectors, None)
+    path = str(tmp_path / "processed_tuples")
+    store.save(path)
+    return path
+
+
+@pytest.fixture
+def seeds(tmp_path):
+    path = tmp_path / "seeds.txt"
+    path.write_text("e1:ORG\ne2:LOC\n\nSAP;Walldorf\nNokia;Espoo\nBayer;Leverkusen\n", encoding="utf8")
+    return str(path)
+
+
+def run(tuples, seeds, checkpoint, similarity=0.5, resume=False):
+    snowball = Snowball(CONFIG, seeds, None, similarity, 0.5, 2)
+    snowball.init_bootstrap(tuples, resume=resume, checkpoint=checkpoint)
+    with open("relationships.jsonl", encoding="utf8") as f_in:
+        return f_in.read()
+
+
+def test_resume_from_checkpoint(tuples, seeds, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    relationships = run(tuples, seeds, "full.npz")
+    assert relationships
+
+    # interrupt a run after the checkpoint of its second iteration is saved
+    save_checkpoint = Snowball.save_checkpoint
+
+    def interrupted(snowball, path):
+        save_checkpoint(snowball, path)
+        if snowball.current_iteration == 2:  # noqa: PLR2004
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(Snowball, "save_checkpoint", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run(tuples, seeds, "interrupted.npz")
+    monkeypatch.setattr(Snowball, "save_checkpoint", save_checkpoint)
+    os.remove("relationships.jsonl")
+    assert run(tuples, seeds, "interrupted.npz", resume=True) == relationships
+
+
+def test_resume_with_other_parameters_or_seeds(tuples, seeds, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run(tuples, seeds, "checkpoint.npz")
+    with pytest.raises(ValueError, match="threshold_similarity"):
+        run(tuples, seeds, "checkpoint.npz", similarity=0.9, resume=True)
+
+    other_seeds = tmp_path / "other_seeds.txt"
+    other_seeds.write_text("e1:ORG\ne2:LOC\n\nSAP;Walldorf\n", encoding="utf8")
+    with pytest.raises(ValueError, match="different seeds"):
+        run(tuples, str(other_seeds), "checkpoint.npz", resume=True)
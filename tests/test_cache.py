@@ -0,0 +1,57 @@
+import os
+from types import SimpleNamespace
+
+from snowball.cache import MEGABYTE, PreprocessingCache, cache_key
+
+
+def make_config(**parameters):
+    defaults = {
+        "e1_type": "ORG",
+        "e2_type": "LOC",
+        "context_window_size": 2,
+        "max_tokens_away": 6,
+        "min_tokens_away": 1,
+        "use_reverb": True,
+        "prefilter": False,
+    }
+    return SimpleNamespace(**{**defaults, **parameters})
+
+
+def test_cache_key(tmp_path):
+    sentences = tmp_path / "sentences.txt"
+    sentences.write_text("The <ORG>Bayer</ORG> headquarters in <LOC>Leverkusen</LOC> .\n")
+    key = cache_key(str(sentences), make_config())
+    assert key == cache_key(str(sentences), make_config())
+    assert key != cache_key(str(sentences), make_config(max_tokens_away=4))
+    assert key != cache_key(str(sentences), make_config(e2_type="PER"))
+    assert key != cache_key(str(sentences), make_config(prefilter=True))
+    sentences.write_text("The <ORG>SAP</ORG> headquarters in <LOC>Walldorf</LOC> .\n")
+    assert key != cache_key(str(sentences), make_config())
+
+
+def add_entry(cache, key, size):
+    tmp_path = cache.create(key)
+    with open(os.path.join(tmp_path, "data"), "wb") as f_out:
+        f_out.write(b"\0" * size)
+    return cache.commit(key, tmp_path)
+
+
+def test_cache_lookup(tmp_path):
+    cache = PreprocessingCache(str(tmp_path), max_size_mb=1)
+    assert cache.lookup("a") is None
+    path = add_entry(cache, "a", 10)
+    assert cache.lookup("a") == path
+    assert os.path.exists(os.path.join(path, "data"))
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_cache_eviction(tmp_path):
+    cache = PreprocessingCache(str(tmp_path), max_size_mb=1)
+    add_entry(cache, "a", MEGABYTE // 3)
+    add_entry(cache, "b", MEGABYTE // 3)
+    # 'a' is used again, so 'b' is the least recently used entry when 'c' goes over the limit
+    cache.lookup("a")
+    add_entry(cache, "c", MEGABYTE // 2)
+    assert cache.lookup("a") is not None
+    assert cache.lookup("b") is None
+    assert cache.lookup("c") is not None
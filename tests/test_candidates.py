@@ -0,0 +1,113 @@
+import random
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from snowball.candidates import CandidateTable
+from snowball.tuple_store import TupleStore
+
+
+def make_store(*pairs):
+    """A TupleStore with a tuple for each pair of entities, tuples with the same entities are equal"""
+    store = TupleStore()
+    for ent1, ent2 in pairs:
+        store.add(ent1, ent2, "sentence", ([], [("in", "IN")], []), (None, [], None), None)
+    store.flush()
+    return store
+
+
+class MockPattern:
+    def __init__(self, confidence):
+        self.confidence = confidence
+
+
+def add(table, positions, pattern_ids, scores):
+    table.add(np.array(positions), np.array(pattern_ids), np.array(scores))
+
+
+def test_candidates_order_and_equal_tuples():
+    tuples = make_store(("a", "b"), ("c", "d"), ("a", "b"), ("e", "f"))
+    table = CandidateTable(tuples)
+    pattern_ids = table.register_patterns([MockPattern(0.5), MockPattern(1.0)])
+    add(table, [3, 0], pattern_ids[[0, 0]], [0.9, 0.8])
+    add(table, [2, 1], pattern_ids[[0, 1]], [0.7, 0.6])
+    # the tuple at position 2 is equal to the one at position 0, its extraction counts for the same tuple
+    assert list(table) == [tuples[3], tuples[0], tuples[1]]
+    assert len(table) == len(set(tuples))
+    assert tuples[0] == tuples[2]
+
+
+def test_candidates_confidence():
+    tuples = make_store(("a", "b"), ("c", "d"))
+    table = CandidateTable(tuples)
+    patterns = [MockPattern(0.5), MockPattern(1.0)]
+    pattern_ids = table.register_patterns(patterns)
+    add(table, [0, 1], pattern_ids[[0, 1]], [0.8, 0.6])
+    add(table, [0, 0], pattern_ids[[1, 0]], [0.9, 0.7])
+    table.update_confidence(w_updt=0.5, damping=False)
+    # the second extraction of the tuple by the first pattern also counts
+    assert tuples[0].confidence == pytest.approx(1 - (1 - 0.5 * 0.8) * (1 - 1.0 * 0.9) * (1 - 0.5 * 0.7))
+    assert tuples[1].confidence == pytest.approx(0.6)
+
+    patterns[1].confidence = 0.5
+    table.update_confidence(w_updt=0.5, damping=True)
+    assert tuples[1].confidence_old == pytest.approx(0.6)
+    assert tuples[1].confidence == pytest.approx(0.5 * 0.3 + 0.5 * 0.6)
+
+
+def test_candidates_patterns_registry():
+    table = CandidateTable(TupleStore())
+    patterns = [MockPattern(0.5), MockPattern(1.0)]
+    assert list(table.register_patterns(patterns)) == [0, 1]
+    assert list(table.register_patterns([MockPattern(0.1), patterns[1]])) == [2, 1]
+    table.update_confidence(w_updt=0.5, damping=True)
+    assert not list(table)
+
+
+def test_candidates_arrays_round_trip():
+    tuples = make_store(("a", "b"), ("c", "d"), ("a", "b"))
+    table = CandidateTable(tuples)
+    patterns = [MockPattern(0.5), MockPattern(1.0)]
+    pattern_ids = table.register_patterns(patterns)
+    add(table, [1, 0], pattern_ids[[0, 0]], [0.9, 0.8])
+    add(table, [2, 0], pattern_ids[[1, 1]], [0.7, 0.6])
+
+    restored = CandidateTable(tuples)
+    restored.restore(table.to_arrays(), patterns)
+    assert list(restored) == list(table)
+    assert list(restored.register_patterns(patterns)) == [0, 1]
+    for name, chunks in table.columns.items():
+        assert np.array_equal(np.concatenate(restored.columns[name]), np.concatenate(chunks))
+
+
+def test_candidates_same_confidence_as_dict():
+    """The confidences are the same as the ones of the dict of (pattern, score) lists of each tuple used before"""
+    rng = random.Random(3)
+    pairs = [rng.choice([("a", "b"), ("c", "d"), ("e", "f"), ("g", "h")]) for _ in range(30)]
+    tuples = make_store(*pairs)
+    table = CandidateTable(tuples)
+    patterns = [MockPattern(rng.random()) for _ in range(4)]
+    candidates = defaultdict(list)
+    confidence = {}
+    for iteration in range(3):
+        # equal tuples, and the same tuple in every iteration, are extracted again by the same patterns
+        positions = sorted(rng.sample(range(len(pairs)), 20))
+        extractions = [(position, rng.randrange(len(patterns)), rng.random()) for position in positions]
+        for position, pattern_idx, score in extractions:
+            candidates[pairs[position]].append((patterns[pattern_idx], score))
+        pattern_ids = table.register_patterns(patterns)
+        add(table, positions, pattern_ids[[idx for _, idx, _ in extractions]], [score for _, _, score in extractions])
+
+        for pattern in patterns:
+            pattern.confidence = rng.random()
+        table.update_confidence(w_updt=0.5, damping=iteration > 0)
+        for pair, extracted in candidates.items():
+            new = 1.0
+            for pattern, score in extracted:
+                new *= 1 - pattern.confidence * score
+            old = confidence.get(pair, 0.0)
+            confidence[pair] = (1 - new) * 0.5 + old * 0.5 if iteration > 0 else 1 - new
+
+        assert [(tpl.ent1, tpl.ent2) for tpl in table] == list(candidates)
+        assert [tpl.confidence for tpl in table] == pytest.approx(list(confidence.values()), abs=1e-12)
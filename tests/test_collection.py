@@ -0,0 +1,135 @@
+import random
+
+import numpy as np
+import pytest
+from gensim.matutils import cossim
+
+from snowball.collection import (
+    Centroids,
+    Shard,
+    Snapshot,
+    collection_pool,
+    score_shard,
+    selectivity_counts,
+    set_snapshot,
+    shards,
+)
+from snowball.seed import Seed, SeedIndex
+from snowball.tuple_store import TupleStore
+
+ALPHA, BETA, GAMMA = 0.2, 0.6, 0.2
+ORGS, LOCS = ["SAP", "Nokia", "Bayer"], ["Walldorf", "Espoo", "Leverkusen", "Berlin"]
+
+
+def random_vector(rng, n_features=20):
+    ids = sorted(rng.sample(range(n_features), rng.randint(1, 4)))
+    weights = np.array([rng.random() for _ in ids])
+    return list(zip(ids, (weights / np.linalg.norm(weights)).tolist()))
+
+
+@pytest.fixture
+def store():
+    rng = random.Random(42)
+    store = TupleStore()
+    for _ in range(300):
+        vectors = (random_vector(rng), random_vector(rng), random_vector(rng))
+        store.add(rng.choice(ORGS), rng.choice(LOCS), "sentence", ([], [("in", "IN")], []), vectors, None)
+    store.flush()
+    return store
+
+
+@pytest.fixture
+def centroids():
+    rng = random.Random(7)
+    return [Centroids(random_vector(rng), random_vector(rng), random_vector(rng)) for _ in range(5)]
+
+
+def collect(store, snapshot, workers):
+    with collection_pool(store, ALPHA, BETA, GAMMA, workers) as collector:
+        return list(collector(snapshot))
+
+
+def merge(results):
+    return (
+        np.concatenate([result.positions for result in results]),
+        np.concatenate([result.columns for result in results]),
+        np.concatenate([result.scores for result in results]),
+        sum(result.counts for result in results),
+    )
+
+
+def test_shards_cover_all_tuples():
+    for n_tuples, workers in ((300, 1), (300, 3), (5, 4), (0, 2)):
+        tasks = shards(n_tuples, 0, workers)
+        assert [(shard.start, shard.end) for shard in tasks] == list(
+            zip([0] + [shard.end for shard in tasks[:-1]], [shard.end for shard in tasks])
+        )
+        assert sum(shard.end - shard.start for shard in tasks) == n_tuples
+
+
+def test_selectivity_counts(store):
+    seed_index = SeedIndex([Seed("SAP", "Walldorf"), Seed("Nokia", "Espoo")], [Seed("Bayer", "Berlin")])
+    positions, columns = np.array([0, 0, 5, 7, 7]), np.array([1, 0, 1, 1, 2])
+    expected = np.zeros((3, 3), dtype=np.int64)
+    for position, column in zip(positions, columns):
+        expected[column] += seed_index.classify(store[position].ent1, store[position].ent2)
+    assert np.array_equal(selectivity_counts(store, seed_index, positions, columns, 3), expected)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_shards_merged_same_as_one_shard(store, centroids, workers):
+    seed_index = SeedIndex([Seed("SAP", "Walldorf"), Seed("Nokia", "Espoo")], [])
+    snapshot = Snapshot(centroids, seed_index, 0.3)
+    positions, columns, scores, counts = merge(collect(store, snapshot, workers))
+
+    with collection_pool(store, ALPHA, BETA, GAMMA, 1):
+        set_snapshot(0, snapshot)
+        single = score_shard(Shard(0, len(store), 0))
+    assert len(positions) > 0
+    assert np.array_equal(positions, single.positions)
+    assert np.array_equal(columns, single.columns)
+    # the scores of each tuple do not depend on the shard it is in
+    assert np.array_equal(scores, single.scores)
+    assert np.array_equal(counts, single.counts)
+    assert (scores >= 0.3).all()  # noqa: PLR2004
+
+
+def test_snapshot_of_each_iteration(store, centroids):
+    """The workers score the shards of each iteration against the snapshot of that iteration"""
+    snapshots = [
+        Snapshot(centroids, SeedIndex([Seed("SAP", "Walldorf")], []), 0.3),
+        Snapshot(centroids[2:], SeedIndex([Seed("Nokia", "Espoo")], []), 0.2),
+    ]
+    expected = [merge(collect(store, snapshot, 1)) for snapshot in snapshots]
+    with collection_pool(store, ALPHA, BETA, GAMMA, 2) as collector:
+        for snapshot, arrays in zip(snapshots, expected):
+            for array, expected_array in zip(merge(list(collector(snapshot))), arrays):
+                assert np.array_equal(array, expected_array)
+
+
+def test_threshold_ties_same_as_pairwise_similarity():
+    """A tuple with the same BET vector as a pattern scores beta, at a threshold equal to beta the decisions, and the
+    selectivity counts, are the ones of the pairwise similarity computed with gensim's cossim()"""
+    rng = random.Random(0)
+    bets = [[(idx, rng.random()) for idx in sorted(rng.sample(range(20), rng.randint(1, 4)))] for _ in range(50)]
+    store = TupleStore()
+    for bet in bets * 2:
+        store.add(rng.choice(ORGS), rng.choice(LOCS), "sentence", ([], [("in", "IN")], []), (None, bet, None), None)
+    store.flush()
+    centroids = [Centroids(None, bet, None) for bet in bets]
+    seed_index = SeedIndex([Seed("SAP", "Walldorf"), Seed("Nokia", "Espoo")], [Seed("Bayer", "Berlin")])
+    positions, columns, scores, counts = merge(collect(store, Snapshot(centroids, seed_index, BETA), 1))
+
+    expected = {}
+    expected_counts = np.zeros((len(centroids), 3), dtype=np.int64)
+    for position, tpl in enumerate(store):
+        for column, centroid in enumerate(centroids):
+            score = ALPHA * 0 + BETA * cossim(tpl.bet_vector, centroid.centroid_bet) + GAMMA * 0
+            if score >= BETA:
+                expected[position, column] = score
+            if score > BETA:
+                expected_counts[column] += seed_index.classify(tpl.ent1, tpl.ent2)
+    assert dict(zip(zip(positions.tolist(), columns.tolist()), scores.tolist())) == expected
+    assert np.array_equal(counts, expected_counts)
+    # some of the ties are one bit above the threshold
+    assert 0 < expected_counts.sum() < len(store)
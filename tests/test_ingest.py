@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import random
+
+import pytest
+
+from snowball import ingest
+from snowball.config import Config
+from snowball.ingest import append_tuples, chunk_offsets, generate_tuples, read_lines
+from snowball.sentence import _tokenize_entity
+from snowball.tuple_store import CONTEXTS
+
+CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, "parameters.cfg")
+STOPWORDS = {"a", "in", "is", "the", "of", "."}
+TAGS = {"is": "VBZ", "based": "VBN", "opened": "VBD", "built": "VBD", "closed": "VBD", "moved": "VBD", "in": "IN"}
+VERBS = ["is based in", "opened", "built", "closed", "moved"]
+NOUNS = ["a plant in", "offices to", "stores in", "and"]
+
+
+class MockTagger:
+    @staticmethod
+    def tag_sents(sentences):
+        return [[(token, TAGS.get(token, "NN")) for token in tokens] for tokens in sentences]
+
+
+class MockLemmatizer:
+    @staticmethod
+    def lemmatize(word, pos):
+        return "be" if word == "is" else word
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """A configuration with a stubbed tokenizer, tagger, stopwords and lemmatizer"""
+    monkeypatch.setattr("snowball.sentence.word_tokenize", str.split)
+    monkeypatch.setattr("snowball.sentence.not_valid", lambda: frozenset(STOPWORDS))
+    monkeypatch.setitem(ingest._worker_state, "tagger", MockTagger())
+    _tokenize_entity.cache_clear()
+    seeds = tmp_path / "seeds.txt"
+    seeds.write_text("e1:ORG\ne2:LOC\n\nSAP;Walldorf\n", encoding="utf8")
+    config = Config(CONFIG, str(seeds), None, 0.6, 0.7, 1)
+    config._stopwords = STOPWORDS
+    config.reverb.lmtzr = MockLemmatizer()
+    yield config
+    _tokenize_entity.cache_clear()
+
+
+def write_sentences(path, n_sentences, seed):
+    """Write a file with random sentences, each one with an ORG and a LOC entity"""
+    rng = random.Random(seed)
+    lines = [
+        f"In {rng.choice(['May', 'June'])} <ORG>Company {rng.randrange(20)}</ORG> "
+        f"{rng.choice(VERBS)} {rng.choice(NOUNS)} <LOC>City {rng.randrange(20)}</LOC> "
+        f", said {rng.choice(['Reuters', 'the CEO'])} .\n"
+        for _ in range(n_sentences)
+    ]
+    path.write_text("".join(lines), encoding="utf8")
+    return str(path)
+
+
+def contents(tuples):
+    """The entities, contexts and TF-IDF vectors of all the tuples in a store"""
+    return [
+        (tpl.ent1, tpl.ent2, tpl.bef_words, tpl.bet_words, tpl.aft_words, tpl.passive_voice)
+        + tuple(tuples.vector(idx, context) for context in CONTEXTS)
+        for idx, tpl in enumerate(tuples)
+    ]
+
+
+@pytest.fixture
+def sentences_file(tmp_path):
+    """Create a sentences file with lines of different lengths"""
+    path = tmp_path / "sentences.txt"
+    lines = [f"<ORG>Company {i}</ORG> is based in <LOC>City {i}</LOC>{' .' * (i % 7)}\n" for i in range(50)]
+    path.write_text("".join(lines), encoding="utf8")
+    return str(path), lines
+
+
+@pytest.mark.parametrize("n_chunks", [1, 2, 3, 7, 50, 1000])
+def test_chunks_cover_all_lines(sentences_file, n_chunks):
+    """Test that the lines read from all the chunks are the lines of the file, in order"""
+    path, lines = sentences_file
+    chunks = chunk_offsets(path, n_chunks)
+    assert len(chunks) <= n_chunks
+    assert [line for start, end in chunks for line in read_lines(path, start, end)] == lines
+
+
+def test_chunks_start_at_line_boundaries(sentences_file):
+    """Test that every chunk starts at the beginning of a line"""
+    path, _ = sentences_file
+    with open(path, "rb") as f_in:
+        content = f_in.read()
+    for start, _ in chunk_offsets(path, 9):
+        assert start == 0 or content[start - 1 : start] == b"\n"
+
+
+def test_chunks_empty_file(tmp_path):
+    """Test that an empty file has no chunks"""
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    assert not chunk_offsets(str(path), 4)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="the workers inherit the stubs when forked")
+def test_generate_tuples_any_number_of_workers(config, tmp_path):
+    """Test that the tuples, and their vectors, do not depend on the number of workers"""
+    path = write_sentences(tmp_path / "sentences.txt", 200, 1)
+    generated = []
+    for workers in (1, 2):
+        config.vsm = None
+        generated.append(contents(generate_tuples(path, config, workers)))
+    assert len(generated[0]) > 100  # noqa: PLR2004
+    assert generated[0] == generated[1]
+
+
+def test_append_tuples(config, tmp_path):
+    """Test that appending sentences gives the tuples of the concatenated files, the vectors of the tuples already
+    generated are only computed again if the IDF drifted more than the tolerance"""
+    first = write_sentences(tmp_path / "first.txt", 150, 2)
+    second = write_sentences(tmp_path / "second.txt", 50, 3)
+    concatenated = tmp_path / "concatenated.txt"
+    with open(first, encoding="utf8") as f_first, open(second, encoding="utf8") as f_second:
+        concatenated.write_text(f_first.read() + f_second.read(), encoding="utf8")
+    config.vsm = None
+    expected = contents(generate_tuples(str(concatenated), config))
+
+    config.vsm = None
+    appended = contents(append_tuples(second, config, generate_tuples(first, config), max_idf_drift=0.0))
+    assert appended == expected
+
+    config.vsm = None
+    tuples = generate_tuples(first, config)
+    previous = contents(tuples)
+    appended = contents(append_tuples(second, config, tuples, max_idf_drift=float("inf")))
+    assert appended[: len(previous)] == previous
+    assert appended[len(previous) :] == expected[len(previous) :]
+    assert previous != expected[: len(previous)]
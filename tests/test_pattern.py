@@ -73,3 +73,86 @@ def test_update_selectivity(test_pattern, test_config):
     assert test_pattern.positive == 1
     assert test_pattern.negative == 2
 """
+
+import pytest
+
+from snowball.pattern import Pattern, PatternIndex, patterns_from_arrays, patterns_to_arrays
+from snowball.tuple_store import TupleStore
+
+
+def make_store(*vectors):
+    """A TupleStore with a tuple for each (bef, bet, aft) vectors"""
+    store = TupleStore()
+    for bef, bet, aft in vectors:
+        store.add("e1", "e2", "sentence", ([], [("in", "IN")], []), (bef, bet, aft), None)
+    store.flush()
+    return store
+
+
+def test_centroid_single_tuple():
+    pattern = Pattern(make_store((None, [(1, 0.6), (2, 0.8)], [])), 0)
+    assert pattern.centroid_bef is None
+    assert pattern.centroid_bet == [(1, 0.6), (2, 0.8)]
+    assert pattern.centroid_aft == []
+
+
+def test_centroid_average():
+    store = make_store(
+        ([(3, 1.0)], [(1, 0.6), (2, 0.8)], None),
+        (None, [(2, 0.6), (4, 0.8)], [(5, 1.0)]),
+        ([(3, 1.0)], [(1, 1.0)], [(5, 1.0)]),
+    )
+    pattern = Pattern(store, 0)
+    pattern.add_tuple(1)
+    pattern.add_tuple(2)
+    assert pattern.centroid_bef == [(3, 2.0 / 3)]
+    assert pattern.centroid_bet == pytest.approx([(1, 1.6 / 3), (2, 1.4 / 3), (4, 0.8 / 3)])
+    # the first tuple has no AFT context
+    assert pattern.centroid_aft is None
+
+
+def test_not_normalized_vector():
+    pattern = Pattern(make_store((None, [(1, 1.0)], None), (None, [(1, 2.0)], None)), 0)
+    with pytest.raises(ValueError):
+        pattern.add_tuple(1)
+    assert len(pattern.tuples) == 1
+    assert pattern.centroid_bet == [(1, 1.0)]
+
+
+def test_pattern_index_candidates():
+    store = make_store(
+        ([(3, 1.0)], [(1, 1.0)], None),
+        (None, [(2, 1.0)], [(5, 1.0)]),
+        ([(3, 1.0)], [(4, 1.0)], [(5, 1.0)]),
+    )
+    patterns = [Pattern(store, 0), Pattern(store, 1)]
+    index = PatternIndex(["bef", "bet"])
+    for pattern_idx, pattern in enumerate(patterns):
+        index.add_pattern(pattern_idx, pattern)
+    vectors = {ctx: store.vector(2, ctx) for ctx in ("bef", "bet")}
+    # shares the BEF term with the first pattern, the AFT context is not indexed
+    assert index.candidates(vectors) == [0]
+
+    # the second pattern has no BEF centroid, adding the tuple only indexes its BET term
+    patterns[1].add_tuple(2)
+    index.add_tuple(1, patterns[1], vectors)
+    assert index.candidates(vectors) == [0, 1]
+    assert index.candidates({"bef": [(3, 1.0)], "bet": None}) == [0]
+    assert index.candidates({"bef": None, "bet": [(6, 1.0)]}) == []
+
+
+def test_patterns_arrays_round_trip():
+    store = make_store(
+        ([(3, 1.0)], [(1, 0.6), (2, 0.8)], None),
+        (None, [(2, 0.6), (4, 0.8)], [(5, 1.0)]),
+    )
+    patterns = [Pattern(store, 0), Pattern(store, 1)]
+    patterns[0].add_tuple(1)
+    patterns[0].positive, patterns[0].unknown, patterns[0].confidence = 2, 1, 0.5
+    restored = patterns_from_arrays(store, patterns_to_arrays(patterns))
+    assert [pattern.tuples for pattern in restored] == [[0, 1], [1]]
+    assert (restored[0].positive, restored[0].negative, restored[0].unknown) == (2, 0, 1)
+    assert restored[0].confidence == patterns[0].confidence
+    assert restored[0].centroid_bet == patterns[0].centroid_bet
+    assert restored[1].centroid_bef is None
+    assert not patterns_from_arrays(store, patterns_to_arrays([]))
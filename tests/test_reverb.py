@@ -0,0 +1,57 @@
+import pytest
+
+from snowball.reverb_breds import PTB_MATCHER, Reverb
+
+
+class CountingLemmatizer:
+    def __init__(self):
+        self.calls = 0
+
+    def lemmatize(self, word, pos):
+        self.calls += 1
+        return {"was": "be", "is": "be"}.get(word, word)
+
+
+@pytest.mark.parametrize(
+    ("tagged_text", "expected"),
+    [
+        # V P
+        ([("is", "VBZ"), ("based", "VBN"), ("in", "IN")], [("is", "VBZ"), ("based", "VBN"), ("in", "IN")]),
+        # V W* P
+        (
+            [("has", "VBZ"), ("an", "DT"), ("office", "NN"), ("in", "IN")],
+            [("has", "VBZ"), ("an", "DT"), ("office", "NN"), ("in", "IN")],
+        ),
+        # no verb, no pattern
+        ([("a", "DT"), ("company", "NN"), ("in", "IN")], []),
+        # the patterns are merged into a single relation phrase
+        (
+            [("opened", "VBD"), (",", ","), ("moved", "VBD"), ("to", "TO")],
+            [("opened", "VBD"), ("moved", "VBD"), ("to", "TO")],
+        ),
+        (
+            [("opened", "VBD"), ("moved", "VBD"), ("a", "DT"), ("office", "NN")],
+            [("opened", "VBD"), ("moved", "VBD"), ("a", "DT"), ("office", "NN")],
+        ),
+        ([("said", "VBD"), (",", ","), ("based", "VBN")], [("said", "VBD"), ("based", "VBN")]),
+        # the token after a pattern never starts another one
+        ([("based", "VBN"), ("in", "IN"), ("opened", "VBD")], [("based", "VBN"), ("in", "IN")]),
+    ],
+)
+def test_extract_reverb_patterns_tagged_ptb(tagged_text, expected):
+    assert Reverb.extract_reverb_patterns_tagged_ptb(tagged_text) == expected
+
+
+def test_matcher_spans():
+    assert PTB_MATCHER.spans(["NN", "VBZ", "RB", "DT", "NN", "IN", "VBD", "CD", "VB"]) == [(1, 6), (8, 9)]
+    assert not PTB_MATCHER.spans([])
+
+
+def test_detect_passive_voice_lemmas():
+    reverb = Reverb()
+    reverb.lmtzr = CountingLemmatizer()
+    pattern = [("was", "VBD"), ("acquired", "VBN"), ("by", "IN")]
+    assert reverb.detect_passive_voice(pattern)
+    assert reverb.detect_passive_voice(pattern)
+    assert not reverb.detect_passive_voice([("is", "VBZ"), ("based", "VBN"), ("in", "IN")])
+    assert reverb.lmtzr.calls == len({"was", "is"})
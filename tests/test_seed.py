@@ -1,4 +1,4 @@
-from snowball.seed import Seed
+from snowball.seed import Seed, SeedIndex
 
 
 def test_seed_creation():
@@ -22,3 +22,34 @@ def test_seed_hashing():
     s3 = Seed("b", "a")
     assert hash(s1) == hash(s2)
     assert hash(s1) != hash(s3)
+
+
+def classify_with_loops(positive_seeds, negative_seeds, ent1, ent2):
+    positive = negative = unknown = 0
+    for seed in positive_seeds:
+        if seed.ent1.strip() == ent1.strip():
+            if seed.ent2.strip() == ent2.strip():
+                positive += 1
+            else:
+                negative += 1
+        else:
+            for neg_seed in negative_seeds:
+                if neg_seed.ent1.strip() == ent1.strip() and neg_seed.ent2.strip() == ent2.strip():
+                    negative += 1
+            unknown += 1
+    return positive, negative, unknown
+
+
+def test_seed_index_classify():
+    positive_seeds = {Seed("a", "b"), Seed("a ", "b"), Seed("a", "c"), Seed("d", "e")}
+    negative_seeds = {Seed("x", "y"), Seed("a", "z"), Seed("x ", " y")}
+    index = SeedIndex(positive_seeds, negative_seeds)
+    for ent1, ent2 in [("a", "b"), (" a", "c"), ("a", "z"), ("x", "y"), ("d", "e"), ("q", "r")]:
+        assert index.classify(ent1, ent2) == classify_with_loops(positive_seeds, negative_seeds, ent1, ent2)
+
+
+def test_seed_index_add_positive():
+    index = SeedIndex([Seed("a", "b")], [Seed("c", "d")])
+    assert index.classify("c", "d") == (0, 1, 1)
+    index.add_positive(Seed("c", "d"))
+    assert index.classify("c", "d") == (1, 1, 1)
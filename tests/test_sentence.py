@@ -1,6 +1,21 @@
 import pytest
 
-from snowball.sentence import Entity, Relationship, tokenize_entity
+from snowball.sentence import (
+    Entity,
+    Relationship,
+    Sentence,
+    _tokenize_entity,
+    find_locations,
+    may_have_relationship,
+    token_positions,
+    tokenize_entity,
+)
+
+
+class MockTagger:
+    @staticmethod
+    def tag(tokens):
+        return [(token, "NN") for token in tokens]
 
 
 @pytest.fixture
@@ -9,6 +24,9 @@ def mock_word_tokenize(monkeypatch):
         return entity.split()  # Simulate word_tokenize behavior with simple splitting
 
     monkeypatch.setattr("snowball.sentence.word_tokenize", mock_tokenize)
+    _tokenize_entity.cache_clear()
+    yield
+    _tokenize_entity.cache_clear()
 
 
 def test_tokenize_entity(mock_word_tokenize):
@@ -29,6 +47,14 @@ def test_tokenize_entity_with_multiple_spaces(mock_word_tokenize):
     assert tokenize_entity(entity) == expected_tokens
 
 
+def test_find_locations(mock_word_tokenize):
+    tokens = "SAP is based in Walldorf , SAP AG is in Walldorf .".split()
+    assert token_positions(tokens)["Walldorf"] == [4, 10]
+    assert find_locations("SAP AG", tokens) == (["SAP", "AG"], [6])
+    assert find_locations("Walldorf", tokens, token_positions(tokens)) == (["Walldorf"], [4, 10])
+    assert find_locations("Berlin", tokens) == (["Berlin"], [])
+
+
 def test_entity_hashing():
     entity1 = Entity("example", ["example"], "ORG", [0, 1])
     entity2 = Entity("example", ["example"], "ORG", [0, 1])
@@ -61,3 +87,60 @@ def test_relationship():
 
     rel2 = Relationship(sentence, before, between, after, ent1_str, ent2_str, "LOC", "LOC")
     assert not rel1 == rel2
+
+
+def test_sentence_relationships(mock_word_tokenize):
+    sentence = Sentence(
+        "The tech company <ORG>Soundcloud</ORG> is based in <LOC>Berlin</LOC> , capital of <LOC>Germany</LOC> .",
+        "ORG",
+        "LOC",
+        6,
+        1,
+        2,
+        MockTagger(),
+    )
+    assert len(sentence.relationships) == 1
+    rel = sentence.relationships[0]
+    assert (rel.ent1, rel.ent2) == ("Soundcloud", "Berlin")
+    assert rel.before == [("tech", "NN"), ("company", "NN")]
+    assert rel.between == [("is", "NN"), ("based", "NN"), ("in", "NN")]
+    assert rel.after == [(",", "NN"), ("capital", "NN")]
+
+
+def test_sentence_context_tokens(mock_word_tokenize):
+    sentence = Sentence("<ORG>Sound Cloud</ORG> is based in <LOC>Berlin</LOC> .", "ORG", "LOC", 6, 1, 2, MockTagger())
+    assert sentence.text_tokens == ["Sound", "Cloud", "is", "based", "in", "Berlin", "."]
+    assert sentence.context_tokens() == ["is", "based", "in", "."]
+
+
+def test_sentence_without_entities(mock_word_tokenize):
+    sentence = Sentence("No entities in this sentence .", "ORG", "LOC", 6, 1, 2)
+    assert not sentence.relationships
+    assert sentence.context_tokens() == ["No", "entities", "in", "this", "sentence", "."]
+
+
+def test_sentence_tagged_later(mock_word_tokenize):
+    text = "The tech company <ORG>Soundcloud</ORG> is based in <LOC>Berlin</LOC> , capital of <LOC>Germany</LOC> ."
+    sentence = Sentence(text, "ORG", "LOC", 6, 1, 2)
+    assert not sentence.relationships
+    assert [(ent1.string, ent2.string) for ent1, ent2, _, _ in sentence.pairs] == [("Soundcloud", "Berlin")]
+    sentence.add_tagged_text(MockTagger.tag(sentence.text_tokens))
+    tagged = Sentence(text, "ORG", "LOC", 6, 1, 2, MockTagger())
+    assert sentence.relationships == tagged.relationships
+    assert sentence.relationships[0].after == tagged.relationships[0].after
+
+
+@pytest.mark.parametrize(
+    ("sentence", "expected"),
+    [
+        ("<ORG>Soundcloud</ORG> is based in <LOC>Berlin</LOC> .", True),
+        ("<ORG>Soundcloud</ORG> is based in <ORG>Google</ORG> .", False),
+        ("<LOC>Berlin</LOC> is the home of <ORG>Soundcloud</ORG> .", False),
+        ("<LOC>Berlin</LOC> is the home of <ORG>Soundcloud</ORG> , Soundcloud moved to Berlin .", True),
+        ("<ORG>Soundcloud</ORG> <LOC>Berlin</LOC>", False),
+        ("<ORG>Soundcloud</ORG> is a company which after many years is based in <LOC>Berlin</LOC> .", False),
+        ("<ORG>Berlin</ORG> is based in <LOC>Berlin</LOC> .", False),
+    ],
+)
+def test_may_have_relationship(sentence, expected):
+    assert may_have_relationship(sentence, "ORG", "LOC", 6) == expected
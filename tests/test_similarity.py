@@ -0,0 +1,94 @@
+import random
+
+import numpy as np
+import pytest
+from gensim.matutils import cossim
+
+from snowball.similarity import SimilarityEngine, cosine, to_csr
+from snowball.tuple_store import TupleStore
+
+ALPHA, BETA, GAMMA = 0.2, 0.6, 0.2
+
+
+class MockPattern:
+    def __init__(self, bef, bet, aft):
+        self.centroid_bef = bef
+        self.centroid_bet = bet
+        self.centroid_aft = aft
+
+
+def random_vector(rng, n_features=30):
+    choice = rng.randint(0, 9)
+    if choice == 0:
+        return None
+    if choice == 1:
+        return []
+    ids = rng.sample(range(n_features), rng.randint(1, 5))
+    return [(idx, rng.random()) for idx in ids]
+
+
+def similarity(tpl, pattern):
+    """The similarity as computed by Snowball.similarity()"""
+    score = 0.0
+    for weight, ctx in zip((ALPHA, BETA, GAMMA), ("bef", "bet", "aft")):
+        vector, centroid = tpl.get_vector(ctx), getattr(pattern, "centroid_" + ctx)
+        if vector is not None and centroid is not None:
+            score += weight * cossim(vector, centroid)
+    return score
+
+
+@pytest.fixture
+def tuples_and_patterns():
+    rng = random.Random(42)
+    tuples = TupleStore()
+    for _ in range(200):
+        vectors = (random_vector(rng), random_vector(rng), random_vector(rng))
+        tuples.add("ORG", "LOC", "sentence", ([], [], []), vectors, None)
+    patterns = [MockPattern(random_vector(rng), random_vector(rng), random_vector(rng)) for _ in range(15)]
+    return tuples, patterns
+
+
+def test_scores_match_pairwise_similarity(tuples_and_patterns):
+    tuples, patterns = tuples_and_patterns
+    engine = SimilarityEngine(tuples, ALPHA, BETA, GAMMA)
+    engine.set_patterns(patterns)
+    expected = np.array([[similarity(tpl, pattern) for pattern in patterns] for tpl in tuples])
+    np.testing.assert_allclose(engine.scores_of(np.arange(len(tuples))), expected, atol=1e-12)
+    np.testing.assert_allclose(engine.scores_of(np.arange(50, 60)), expected[50:60], atol=1e-12)
+
+
+def test_patterns_with_unseen_features(tuples_and_patterns):
+    tuples, _ = tuples_and_patterns
+    engine = SimilarityEngine(tuples, ALPHA, BETA, GAMMA)
+    engine.set_patterns([MockPattern(None, [(1000, 1.0)], [])])
+    scores = engine.scores_of(np.arange(len(tuples)))
+    assert scores.shape == (len(tuples), 1)
+    assert not scores.any()
+
+
+def test_to_csr_normalizes_rows():
+    matrix = to_csr([[(0, 3.0), (2, 4.0)], None, []], 3)
+    assert matrix.shape == (3, 3)
+    np.testing.assert_allclose(matrix.toarray(), [[0.6, 0.0, 0.8], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+
+
+def test_candidates_upper_bound(tuples_and_patterns):
+    tuples, patterns = tuples_and_patterns
+    engine = SimilarityEngine(tuples, ALPHA, BETA, GAMMA)
+    engine.set_patterns(patterns)
+    scores = engine.scores_of(np.arange(len(tuples)))
+    assert (scores.max(axis=1) <= engine.bounds + 1e-12).all()
+    for threshold in (0.1, 0.3, 0.5):
+        positions = engine.candidates(0, len(tuples), threshold)
+        pruned = np.setdiff1d(np.arange(len(tuples)), positions)
+        assert (scores[pruned] < threshold).all()
+        np.testing.assert_allclose(engine.scores_of(positions), scores[positions], atol=1e-12)
+    assert list(engine.candidates(50, 60, 0.0)) == list(range(50, 60))
+
+
+def test_cosine_same_as_gensim():
+    rng = random.Random(3)
+    for _ in range(200):
+        vec1, vec2 = random_vector(rng), random_vector(rng)
+        if vec1 is not None and vec2 is not None:
+            assert cosine(vec1, vec2) == cossim(vec1, vec2)
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from snowball.reverb_breds import Reverb
+from snowball.snowball_tuple import ContextDocumentCache, fingerprint
+from snowball.tuple_store import TupleStore
+from snowball.vector_space_model import VectorSpaceModel
+
+
+def test_fingerprint():
+    between = [("based", "VBN"), ("in", "IN")]
+    assert fingerprint("SAP", "Walldorf", [], between, []) == fingerprint("SAP", "Walldorf", [], list(between), [])
+    assert fingerprint("SAP", "Walldorf", [], between, []) != fingerprint("SAP", "Walldorf", between, [], [])
+    assert fingerprint("SAP", "Walldorf", [], between, []) != fingerprint("Walldorf", "SAP", [], between, [])
+
+
+def test_tuple_identity():
+    store = TupleStore()
+    for between in ([("based", "VBN"), ("in", "IN")], [("based", "VBN"), ("in", "IN")], [("in", "IN")]):
+        store.add("SAP", "Walldorf", "sentence", ([], between, []), (None, [], None), None)
+    assert store[0] == store[1]
+    assert hash(store[0]) == hash(store[1])
+    assert store[0] != store[2]
+    assert store[0].fingerprint == fingerprint("SAP", "Walldorf", [], [("based", "VBN"), ("in", "IN")], [])
+
+
+def test_context_document_cache():
+    vsm = VectorSpaceModel()
+    vsm.add_documents([["based", "in"], ["headquartered", "in"], ["acquired", "by"], ["plant"]])
+    vsm.finalize()
+    config = SimpleNamespace(use_reverb="yes", stopwords={"the"}, vsm=vsm, reverb=Reverb())
+    cache = ContextDocumentCache(config, maxsize=2)
+    before, between, after = [("the", "DT"), ("plant", "NN")], [("based", "VBN"), ("in", "IN")], []
+
+    documents, passive_voice = cache.context_documents(before, between, after)
+    assert documents == (("plant",), ("based", "in"), None)
+    assert passive_voice is False
+    # the terms are vectorized as ingest.vectorize_chunk() does, a context with no vector is an empty row
+    matrix = vsm.vectorize([document or () for document in documents])
+    for row, words in zip(matrix, (["plant"], ["based", "in"])):
+        assert list(zip(row.indices.tolist(), row.data.tolist())) == vsm.tf_idf_model[vsm.dictionary.doc2bow(words)]
+    assert not matrix[2].nnz
+    # the contexts are looked up as lists or tuples, the terms of equal contexts are shared
+    cached_documents, _ = cache.context_documents(list(before), tuple(between), after)
+    assert all(cached is document for cached, document in zip(cached_documents, documents))
+    assert cache.stats() == (6, 3)
+
+    # the least recently used BET context is evicted
+    cache.context_documents([], [("headquartered", "VBN"), ("in", "IN")], [])
+    cache.context_documents([], [("acquired", "VBN"), ("by", "IN")], [])
+    cache.context_documents([], between, [])
+    assert cache.bet_document.cache_info().misses == 4  # noqa: PLR2004
+    assert cache.stats() == (15, 9)  # noqa: PLR2004
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from snowball.tuple_store import TupleStore
+
+CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, "parameters.cfg")
+
+
+def imported_modules(code, modules):
+    """The modules, out of the given ones, imported by running the code in a new Python process, printed last"""
+    check = f"{code}\nimport sys\nprint(' '.join(name for name in {modules!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[-1].split()
+
+
+@pytest.mark.parametrize("module", ["snowball.cli", "snowball.bootstrapping"])
+def test_nltk_and_gensim_imported_lazily(module):
+    assert imported_modules(f"import {module}", ("gensim", "nltk")) == []
+
+
+def test_help_imports_no_heavy_modules():
+    code = "from snowball.cli import create_args\ncreate_args().format_help()"
+    assert imported_modules(code, ("gensim", "nltk", "scipy")) == []
+
+
+def test_clustering_cached_tuples_imports_no_gensim(tmp_path):
+    """A run with the tuples already processed, e.g.: loaded from the cache, clusters them without gensim"""
+    store = TupleStore()
+    for idx in range(10):
+        vectors = ([(0, 1.0)], [(1 + idx % 2, 0.8), (3, 0.6)], None)
+        store.add("SAP", "Walldorf", f"sentence {idx}", ([], [("based", "VBN"), ("in", "IN")], []), vectors, None)
+    store.save(str(tmp_path / "tuples"))
+    seeds = tmp_path / "seeds.txt"
+    seeds.write_text("e1:ORG\ne2:LOC\n\nSAP;Walldorf\n", encoding="utf8")
+    code = (
+        "from snowball.bootstrapping import Snowball\n"
+        "from snowball.tuple_store import TupleStore\n"
+        f"snowball = Snowball({CONFIG!r}, {str(seeds)!r}, None, 0.6, 0.7, 1)\n"
+        f"snowball.processed_tuples = TupleStore.load({str(tmp_path / 'tuples')!r})\n"
+        "snowball.build_entity_pair_index()\n"
+        "snowball.cluster_tuples(snowball.match_seeds_tuples()[1])\n"
+        "assert len(snowball.patterns) == 2"
+    )
+    assert imported_modules(code, ("gensim", "nltk")) == []
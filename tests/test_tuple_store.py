@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from snowball.tuple_store import TupleStore
+
+
+def add_tuples(store, tuples):
+    for ent1, ent2, between, bet_vector in tuples:
+        contexts = ([("The", "DT")], between, [])
+        store.add(ent1, ent2, f"{ent1} {ent2}", contexts, ([(0, 1.0)], bet_vector, None), None)
+
+
+def test_store_views():
+    store = TupleStore()
+    add_tuples(store, [("SAP", "Walldorf", [("based", "VBN"), ("in", "IN")], [(1, 0.6), (2, 0.8)])])
+    store.add("Bayer", "Leverkusen", "sentence", ([], [("in", "IN")], [("said", "VBD")]), (None, [], [(3, 1.0)]), True)
+    assert len(store) == 2  # noqa: PLR2004
+    tpl = store[0]
+    assert (tpl.ent1, tpl.ent2, tpl.sentence) == ("SAP", "Walldorf", "SAP Walldorf")
+    assert tpl.bef_words == [("The", "DT")]
+    assert tpl.bet_words == [("based", "VBN"), ("in", "IN")]
+    assert tpl.aft_words == []
+    assert tpl.bef_vector == [(0, 1.0)]
+    assert tpl.bet_vector == [(1, 0.6), (2, 0.8)]
+    assert tpl.aft_vector is None
+    assert tpl.passive_voice is None
+    assert store[1].bef_vector is None
+    assert store[1].bet_vector == []
+    assert store[1].passive_voice is True
+    with pytest.raises(IndexError):
+        store[2]  # noqa: B018
+
+
+def test_store_confidence():
+    store = TupleStore()
+    add_tuples(store, [("SAP", "Walldorf", [("in", "IN")], [(1, 1.0)])])
+    store[0].confidence = 0.75
+    assert store.confidence[0] == 0.75  # noqa: PLR2004
+    assert store[0].to_json()["confidence"] == 0.75  # noqa: PLR2004
+
+
+def test_store_extend():
+    tuples = [
+        ("SAP", "Walldorf", [("in", "IN")], [(1, 1.0)]),
+        ("Bayer", "Leverkusen", [("based", "VBN"), ("in", "IN")], [(2, 0.6), (1, 0.8)]),
+        ("SAP", "Leverkusen", [("near", "IN")], []),
+    ]
+    expected = TupleStore()
+    add_tuples(expected, tuples)
+    first, second = TupleStore(), TupleStore()
+    add_tuples(first, tuples[:1])
+    add_tuples(second, tuples[1:])
+    first.extend(second)
+    assert len(first) == len(expected)
+    assert [tpl.to_json() for tpl in first] == [tpl.to_json() for tpl in expected]
+    assert [tpl.bet_vector for tpl in first] == [tpl.bet_vector for tpl in expected]
+    assert np.array_equal(first.fingerprint, expected.fingerprint)
+    assert first[0] != first[2]
+
+
+def test_store_set_vectors():
+    store = TupleStore()
+    add_tuples(store, [("SAP", "Walldorf", [("in", "IN")], [(1, 1.0)]), ("Bayer", "Leverkusen", [("in", "IN")], [])])
+    vectors = sparse.csr_matrix(np.array([[0.0, 0.6, 0.8], [0.0, 0.0, 0.0]]))
+    store.set_vectors("aft", vectors, np.array([False, True]))
+    assert store[0].aft_vector == [(1, 0.6), (2, 0.8)]
+    assert store[1].aft_vector is None
+    assert store[0].bet_vector == [(1, 1.0)]
+    with pytest.raises(ValueError):
+        store.set_vectors("aft", vectors[:1], np.array([False]))
+
+
+def test_store_save_load(tmp_path):
+    store = TupleStore()
+    add_tuples(
+        store,
+        [
+            ("SAP", "Walldorf", [("in", "IN")], [(1, 1.0)]),
+            ("Société Générale", "Paris", [("based", "VBN"), ("in", "IN")], [(2, 0.6), (1, 0.8)]),
+        ],
+    )
+    path = str(tmp_path / "processed_tuples")
+    store.save(path)
+    loaded = TupleStore.load(path)
+    assert isinstance(loaded.ent1, np.memmap)
+    assert [tpl.to_json() for tpl in loaded] == [tpl.to_json() for tpl in store]
+    assert [tpl.get_vector("bet") for tpl in loaded] == [tpl.get_vector("bet") for tpl in store]
+    assert loaded.entities.get("Société Générale") == 2  # noqa: PLR2004
+    loaded[1].confidence = 0.5
+    assert loaded[1].confidence == 0.5  # noqa: PLR2004
+
+    # saving again replaces the previous store
+    loaded.extend(store)
+    loaded.save(path)
+    assert len(TupleStore.load(path)) == 2 * len(store)
+
+
+def test_store_save_over_interrupted_save(tmp_path):
+    """A previous store left by an interrupted save, at '<path>.old', does not prevent saving again"""
+    store = TupleStore()
+    add_tuples(store, [("SAP", "Walldorf", [("in", "IN")], [(1, 1.0)])])
+    path = str(tmp_path / "processed_tuples")
+    store.save(path)
+    (tmp_path / "processed_tuples.old").mkdir()
+    (tmp_path / "processed_tuples.old" / "ent1.npy").write_bytes(b"stale")
+    for _ in range(2):
+        store.save(path)
+        assert [tpl.to_json() for tpl in TupleStore.load(path)] == [tpl.to_json() for tpl in store]
+    assert not os.path.exists(path + ".old")
+
+
+def test_store_load_other_version(tmp_path):
+    path = str(tmp_path / "processed_tuples")
+    TupleStore().save(path)
+    with open(tmp_path / "processed_tuples" / "format.json", "wt", encoding="utf8") as f_out:
+        f_out.write('{"version": 0, "tuples": 0}')
+    with pytest.raises(ValueError):
+        TupleStore.load(path)
+    with pytest.raises(ValueError):
+        TupleStore.load(str(tmp_path))
@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+import pytest
+
+from snowball import vector_space_model
+from snowball.vector_space_model import VectorSpaceModel
+
+
+def test_idf_drift():
+    vsm = VectorSpaceModel()
+    vsm.add_documents([["based", "headquarters"], ["based"], ["headquarters", "opened"], ["opened"]])
+    vsm.finalize()
+    idf = vsm.idf()
+    assert idf[vsm.dictionary.token2id["based"]] == pytest.approx(1.0)
+    assert vsm.idf_drift(idf) == 0.0
+
+    # 'based' in 3 out of 8 documents, 'headquarters' and 'opened' in 2 out of 8, 'plant' is a new term
+    vsm.add_documents([["based"], ["plant"], ["plant"], ["plant"]])
+    vsm.finalize()
+    # the IDF of "headquarters" and "opened" goes from log2(4 / 2) to log2(8 / 2)
+    assert vsm.idf_drift(idf) == pytest.approx(1.0)
+    assert len(vsm.idf()) == len(idf) + 1
+
+
+def test_vectorize_matches_gensim():
+    rng = random.Random(42)
+    words = [f"w{idx}" for idx in range(50)]
+    vsm = VectorSpaceModel()
+    # the last term is in every document, its IDF is 0 and it is left out of the vectors
+    vsm.add_documents([rng.sample(words, rng.randint(1, 10)) + ["all"] for _ in range(200)])
+    vsm.finalize()
+    documents = [[rng.choice(words + ["all", "unknown"]) for _ in range(rng.randint(0, 20))] for _ in range(2000)]
+    matrix = vsm.vectorize(documents)
+    assert matrix.shape == (len(documents), len(vsm.token2id))
+    for idx, document in enumerate(documents):
+        start, end = matrix.indptr[idx], matrix.indptr[idx + 1]
+        expected = vsm.tf_idf_model[vsm.dictionary.doc2bow(document)]
+        # the same terms and the exact same weights, the norms are summed as sum() does in this interpreter
+        assert list(zip(matrix.indices[start:end].tolist(), matrix.data[start:end].tolist())) == expected
+    assert not vsm.vectorize([["all", "unknown"]]).nnz
+    np.testing.assert_array_equal(vsm.idfs, vsm.idf())
+
+
+def plain_sum(values):
+    """sum() of floats before Python 3.12, adding one value at a time"""
+    total = 0.0
+    for value in values:
+        total += value
+    return total
+
+
+def compensated_sum(values):
+    """sum() of floats since Python 3.12, with Neumaier's compensated summation"""
+    total, compensation = 0.0, 0.0
+    for value in values:
+        new_total = total + value
+        if abs(total) >= abs(value):
+            compensation += (total - new_total) + value
+        else:
+            compensation += (value - new_total) + total
+        total = new_total
+    return total + compensation
+
+
+@pytest.mark.parametrize("compensated", [False, True])
+def test_squared_norms_rounded_as_sum(monkeypatch, compensated):
+    """The norms are rounded as the sum() of the interpreter, plain before Python 3.12 and compensated since"""
+    monkeypatch.setattr(vector_space_model, "COMPENSATED_SUM", compensated)
+    rng = random.Random(1)
+    documents = [[rng.random() * rng.choice([0.01, 1, 10]) for _ in range(rng.randint(1, 30))] for _ in range(500)]
+    rows = np.repeat(np.arange(len(documents)), [len(document) for document in documents])
+    weights = np.array([weight for document in documents for weight in document])
+    norms = VectorSpaceModel.squared_norms(rows, weights, len(documents)).tolist()
+    add = compensated_sum if compensated else plain_sum
+    assert norms == [add(weight**2 for weight in document) for document in documents]
+    # the two differ for some of the documents
+    assert norms != [
+        (plain_sum if compensated else compensated_sum)(weight**2 for weight in document) for document in documents
+    ]